@@ -1,5 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ConnectionFailure
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
+from datetime import datetime
 import os
 from dotenv import load_dotenv
 
@@ -7,6 +9,12 @@ load_dotenv()
 
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "3matic")
+# Posted content older than this is removed by a TTL index (0 keeps it forever)
+POST_RETENTION_DAYS = int(os.getenv("POST_RETENTION_DAYS", "0"))
+
+# Post and document history lives in the posts/documents collections; this keeps any
+# not-yet-migrated arrays out of community reads
+COMMUNITY_PROJECTION = {"documents": 0, "scheduledPosts": 0}
 
 client = None
 db = None
@@ -24,16 +32,83 @@ async def init_db():
         try:
             await db.users.create_index("email", unique=True)
             await db.communities.create_index("userId")
+            await db.communities.create_index([("userId", 1), ("created_at", -1), ("_id", -1)])
             await db.communities.create_index("platform")
+            await db.post_drafts.create_index([("communityId", 1), ("status", 1), ("created_at", 1)])
+            await db.posts.create_index([("communityId", 1), ("timestamp", -1)])
+            await db.documents.create_index([("communityId", 1), ("uploaded_at", -1)])
+            await db.documents.create_index("sha256")
+            if POST_RETENTION_DAYS > 0:
+                await db.posts.create_index("timestamp", expireAfterSeconds=POST_RETENTION_DAYS * 86400)
         except Exception as e:
             print(f"⚠️  Warning: Could not create indexes: {e}")
         
+        try:
+            await migrate_embedded_history()
+        except Exception as e:
+            print(f"⚠️  Warning: Could not migrate community history: {e}")
+        
     except (ConnectionFailure, Exception) as e:
         print(f"⚠️  Warning: MongoDB not available ({e})")
         print("   Server will start in test mode without database")
         client = None
         db = None
 
+def _as_datetime(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+def _without_id(entry: dict) -> dict:
+    return {key: value for key, value in entry.items() if key != "_id"}
+
+async def _upsert_all(collection, requests: list):
+    if not requests:
+        return
+    try:
+        await collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        # Duplicate keys mean another worker upserted the same entries at the same moment
+        if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+
+async def migrate_embedded_history():
+    """Move documents/scheduledPosts arrays out of community documents into their own collections.
+
+    Every worker runs this at startup. Each entry is upserted on an ``_id`` derived from its
+    community and position, so a community migrated twice (two workers starting together, or a
+    crash before the arrays were removed) does not get duplicate rows.
+    """
+    migrated = 0
+    pending = {"$or": [{"documents.0": {"$exists": True}}, {"scheduledPosts.0": {"$exists": True}}]}
+    cursor = db.communities.find(pending, {"documents": 1, "scheduledPosts": 1})
+    async for community in cursor:
+        community_id = str(community["_id"])
+        requests = [
+            ReplaceOne(
+                {"_id": f"{community_id}:document:{index}"},
+                {**_without_id(doc), "communityId": community_id, "uploaded_at": _as_datetime(doc.get("uploaded_at"))},
+                upsert=True
+            )
+            for index, doc in enumerate(community.get("documents", []))
+        ]
+        await _upsert_all(db.documents, requests)
+        requests = [
+            ReplaceOne({"_id": f"{community_id}:post:{index}"}, {**_without_id(post), "communityId": community_id}, upsert=True)
+            for index, post in enumerate(community.get("scheduledPosts", []))
+        ]
+        await _upsert_all(db.posts, requests)
+        await db.communities.update_one(
+            {"_id": community["_id"]},
+            {"$unset": {"documents": "", "scheduledPosts": ""}}
+        )
+        migrated += 1
+    if migrated:
+        print(f"Moved post and document history of {migrated} communities into separate collections")
+
 def get_db():
     if db is None:
         raise Exception("Database not initialized. Please start MongoDB or configure connection.")
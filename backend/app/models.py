@@ -51,8 +51,12 @@ class Community(BaseModel):
     moderationLevel: str = "medium"  # low, medium, high
     engagementStyle: str = "friendly"  # formal, friendly, casual
     postingFrequency: str = "moderate"  # low, moderate, high
-    documents: List[Dict[str, Any]] = []
-    scheduledPosts: List[Dict[str, Any]] = []
+    # Conversation memory retention; unset uses MEMORY_MAX_AGE_DAYS / MEMORY_MAX_INTERACTIONS
+    memoryMaxAgeDays: Optional[int] = None
+    memoryMaxInteractions: Optional[int] = None
+    # Reuse answers to near-duplicate questions; unset threshold uses ANSWER_CACHE_THRESHOLD
+    answerCacheEnabled: bool = False
+    answerCacheThreshold: Optional[float] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -1,12 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request
 from typing import List, Optional
+import asyncio
+import base64
+import time
 from datetime import datetime
 from bson import ObjectId
-import os
-import aiofiles
-import uuid
 
-from app.database import get_db
+from app.database import get_db, COMMUNITY_PROJECTION
 from app.models import Community
 # from app.routers.auth import get_current_user
 
@@ -18,14 +18,18 @@ def get_mock_user():
         "name": "Test User",
         "provider": "test"
     }
-from app.services.vector_store import add_document, get_collection, add_memory
+from app.services.vector_store import add_memory, search, SEARCH_MODES
 from app.services.gemini_service import generate_setup_intro, generate_response
-from app.services.document_processor import process_document
 from app.services.platform_handlers import (
     setup_telegram_webhook,
     send_telegram_message
 )
 from app.services.telegram_service import telegram_service
+from app.services.post_drafts import post_drafts
+from app.services.http_client import telegram_request
+from app.services.community_cache import community_cache
+from app.services.file_storage import FileTooLargeError, store_upload
+from app.services.ingest_jobs import ingest_jobs, job_summary
 
 async def add_memory_task(community_id: str):
     """Add initial memory for deployed community (background task)"""
@@ -43,9 +47,6 @@ async def add_memory_task(community_id: str):
 
 router = APIRouter()
 
-UPLOAD_DIR = "./uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 @router.post("/create")
 async def create_community(request: Request):
     """Create a new community with basic info"""
@@ -111,25 +112,95 @@ async def create_community(request: Request):
         print(f"Error creating community: {e}")
         raise HTTPException(status_code=500, detail="Failed to create community")
 
+# Fields a community listing may return; telegram_token is only sent when asked for
+COMMUNITY_LIST_FIELDS = {
+    "name", "purpose", "status", "platform", "rules", "moderationLevel", "engagementStyle",
+    "postingFrequency", "telegram_chat_id", "telegram_token", "created_at", "updated_at"
+}
+DEFAULT_LIST_FIELDS = COMMUNITY_LIST_FIELDS - {"telegram_token"}
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(community: dict) -> str:
+    raw = f"{community['created_at'].isoformat()}|{community['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    created_at, community_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(created_at), ObjectId(community_id)
+
 @router.get("")
-async def get_communities():  # current_user: dict = Depends(get_current_user) - skipped for testing
-    """Get all communities for current user"""
+async def get_communities(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):  # current_user: dict = Depends(get_current_user) - skipped for testing
+    """Get a page of the current user's communities, newest first.
+
+    Pass the returned ``next_cursor`` to get the following page. ``fields`` is a comma-separated
+    list of community fields to return; document and post counts are always included.
+    """
     # Skip auth for testing
     current_user = get_mock_user()
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    selected = DEFAULT_LIST_FIELDS
+    if fields:
+        selected = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = selected - COMMUNITY_LIST_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    
+    communities = []
+    counts = {}
+    next_cursor = None
     try:
         db = get_db()
         if db:
-            communities = await db.communities.find({"userId": ObjectId(current_user["id"])}).to_list(length=100)
-        else:
-            communities = []
+            query = {"userId": ObjectId(current_user["id"])}
+            if cursor:
+                try:
+                    created_at, last_id = decode_cursor(cursor)
+                except Exception:
+                    raise HTTPException(status_code=400, detail="Invalid cursor")
+                query["$or"] = [
+                    {"created_at": {"$lt": created_at}},
+                    {"created_at": created_at, "_id": {"$lt": last_id}}
+                ]
+            
+            # created_at is always loaded because the cursor is built from it
+            projection = {field: 1 for field in selected | {"created_at", "userId"}}
+            communities = await db.communities.find(query, projection).sort(
+                [("created_at", -1), ("_id", -1)]
+            ).limit(limit + 1).to_list(length=limit + 1)
+            
+            if len(communities) > limit:
+                communities = communities[:limit]
+                next_cursor = encode_cursor(communities[-1])
+            counts = await get_history_counts(db, [str(community["_id"]) for community in communities])
+    except HTTPException:
+        raise
     except:
         communities = []
     
     for community in communities:
         community["_id"] = str(community["_id"])
         community["userId"] = str(community["userId"])
+        if "created_at" not in selected:
+            community.pop("created_at", None)
+        community.update(counts.get(community["_id"], {"documentCount": 0, "postCount": 0}))
     
-    return communities
+    return {"items": communities, "next_cursor": next_cursor}
+
+async def get_history_counts(db, community_ids: List[str]) -> dict:
+    """Document and post counts per community, counted in their own collections"""
+    counts = {community_id: {"documentCount": 0, "postCount": 0} for community_id in community_ids}
+    for collection, field in ((db.documents, "documentCount"), (db.posts, "postCount")):
+        async for row in collection.aggregate([
+            {"$match": {"communityId": {"$in": community_ids}}},
+            {"$group": {"_id": "$communityId", "count": {"$sum": 1}}}
+        ]):
+            counts[row["_id"]][field] = row["count"]
+    return counts
 
 @router.get("/{community_id}")
 async def get_community(community_id: str):  # current_user: dict = Depends(get_current_user) - skipped
@@ -146,7 +217,7 @@ async def get_community(community_id: str):  # current_user: dict = Depends(get_
                 community = await db.communities.find_one({
                     "_id": object_id,
                     "userId": ObjectId(current_user["id"])
-                })
+                }, COMMUNITY_PROJECTION)
             except:
                 # Invalid ObjectId, community not found
                 community = None
@@ -198,14 +269,12 @@ async def connect_community(
         raise HTTPException(status_code=400, detail="Telegram token and chat ID are required")
     
     # Validate bot token by checking bot info
-    import httpx
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"https://api.telegram.org/bot{telegram_token}/getMe")
-            if response.status_code != 200:
-                raise HTTPException(status_code=400, detail="Invalid Telegram bot token")
-        except:
-            raise HTTPException(status_code=400, detail="Failed to validate Telegram bot token")
+    try:
+        response = await telegram_request(telegram_token, "getMe", timeout=5.0)
+        if response.status_code != 200:
+            raise HTTPException(status_code=400, detail="Invalid Telegram bot token")
+    except:
+        raise HTTPException(status_code=400, detail="Failed to validate Telegram bot token")
     
     # Confirm admin status by trying to send a test message
     test_message_sent = await send_telegram_message(telegram_token, telegram_chat_id, "🤖 Bot connected successfully! This is a test message.")
@@ -265,8 +334,6 @@ async def connect_community(
         "moderationLevel": "medium",
         "engagementStyle": "friendly",
         "postingFrequency": "moderate",
-        "documents": [],
-        "scheduledPosts": [],
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
@@ -278,6 +345,41 @@ async def connect_community(
     
     return community
 
+def parse_positive_int(field: str, value):
+    """Validate a numeric setting from the request body (None clears it back to the default)"""
+    if value is None:
+        return None
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise HTTPException(status_code=400, detail=f"{field} must be a positive integer")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{field} must be a positive integer")
+    if value <= 0:
+        raise HTTPException(status_code=400, detail=f"{field} must be a positive integer")
+    return value
+
+def parse_bool(field: str, value) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    raise HTTPException(status_code=400, detail=f"{field} must be true or false")
+
+def parse_fraction(field: str, value):
+    """Validate a setting in (0, 1] (None clears it back to the default)"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise HTTPException(status_code=400, detail=f"{field} must be a number in (0, 1]")
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{field} must be a number in (0, 1]")
+    if not 0 < value <= 1:
+        raise HTTPException(status_code=400, detail=f"{field} must be a number in (0, 1]")
+    return value
+
 @router.put("/{community_id}")
 async def update_community(
     community_id: str,
@@ -302,7 +404,7 @@ async def update_community(
                 community = await db.communities.find_one({
                     "_id": object_id,
                     "userId": ObjectId(current_user["id"])
-                })
+                }, {"_id": 1})
                 if not community:
                     raise HTTPException(status_code=404, detail="Community not found")
             except:
@@ -323,7 +425,8 @@ async def update_community(
     # Only update fields that are provided
     allowed_fields = [
         'name', 'purpose', 'rules', 'moderationLevel', 'engagementStyle',
-        'postingFrequency', 'telegram_token', 'telegram_chat_id'
+        'postingFrequency', 'telegram_token', 'telegram_chat_id',
+        'memoryMaxAgeDays', 'memoryMaxInteractions', 'answerCacheEnabled', 'answerCacheThreshold'
     ]
 
     for field in allowed_fields:
@@ -334,6 +437,14 @@ async def update_community(
     if 'name' in update_data and (not update_data['name'] or not update_data['name'].strip()):
         raise HTTPException(status_code=400, detail="Community name cannot be empty")
 
+    for field in ('memoryMaxAgeDays', 'memoryMaxInteractions'):
+        if field in update_data:
+            update_data[field] = parse_positive_int(field, update_data[field])
+    if 'answerCacheEnabled' in update_data:
+        update_data['answerCacheEnabled'] = parse_bool('answerCacheEnabled', update_data['answerCacheEnabled'])
+    if 'answerCacheThreshold' in update_data:
+        update_data['answerCacheThreshold'] = parse_fraction('answerCacheThreshold', update_data['answerCacheThreshold'])
+
     try:
         if db:
             result = await db.communities.update_one(
@@ -342,6 +453,8 @@ async def update_community(
             )
             if result.matched_count == 0:
                 raise HTTPException(status_code=404, detail="Community not found")
+            community_cache.invalidate(community_id)
+            await post_drafts.discard(community_id)
         # For mock/testing, just return success
 
         return {"status": "updated", "message": "Community settings saved successfully"}
@@ -384,62 +497,99 @@ async def answer_setup_question(
                 {"_id": ObjectId(community_id)},
                 {"$set": update_data}
             )
+            community_cache.invalidate(community_id)
+            await post_drafts.discard(community_id)
     except:
         pass  # Skip database update if not available
     
     return {"status": "saved"}
 
-@router.post("/{community_id}/documents")
+@router.post("/{community_id}/documents", status_code=202)
 async def upload_documents(
     community_id: str,
     files: List[UploadFile] = File(...),
     # current_user: dict = Depends(get_current_user) - skipped
 ):
-    """Upload documents for a community"""
+    """Upload documents for a community - files are saved, then ingested by a background job"""
     current_user = get_mock_user()
     # Skip community check for testing
     
-    uploaded_docs = []
+    saved_files = []
     
     for file in files:
         if not file.filename.endswith(('.pdf', '.doc', '.docx')):
             continue
         
-        file_id = str(uuid.uuid4())
-        file_path = os.path.join(UPLOAD_DIR, f"{community_id}_{file_id}_{file.filename}")
-        
-        # Save file
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-        
-        # Process document
-        doc_data = await process_document(file_path, file.filename)
-        
-        # Add to vector store
-        if doc_data["text"]:
-            await add_document(
-                community_id=community_id,
-                document_id=file_id,
-                text=doc_data["text"],
-                metadata={"filename": file.filename, "file_type": doc_data["file_type"]}
-            )
+        # Stream file into the content-addressed store; an oversized file is recorded as failed
+        # so the files already stored still get ingested
+        try:
+            saved = await store_upload(file)
+        except FileTooLargeError as e:
+            saved_files.append({"filename": file.filename, "path": None, "size": 0, "sha256": None, "error": str(e)})
+            continue
         
-        doc_info = {
-            "id": file_id,
-            "filename": file.filename,
-            "size": len(content),
-            "uploaded_at": datetime.utcnow().isoformat()
-        }
-        uploaded_docs.append(doc_info)
+        saved_files.append({"filename": file.filename, **saved})
+    
+    job = await ingest_jobs.create_job(community_id, saved_files)
+    return job_summary(job)
+
+@router.get("/{community_id}/documents")
+async def list_documents(community_id: str, limit: int = 50):
+    """List a community's uploaded documents, newest first"""
+    try:
+        db = get_db()
+        documents = await db.documents.find(
+            {"communityId": community_id}, {"_id": 0}
+        ).sort("uploaded_at", -1).to_list(length=max(1, min(limit, 100)))
+    except Exception:
+        documents = []
+    return documents
+
+@router.get("/{community_id}/posts")
+async def list_posts(community_id: str, limit: int = 50):
+    """List a community's posted content, newest first"""
+    try:
+        db = get_db()
+        posts = await db.posts.find(
+            {"communityId": community_id}, {"_id": 0}
+        ).sort("timestamp", -1).to_list(length=max(1, min(limit, 100)))
+    except Exception:
+        posts = []
+    return posts
+
+@router.get("/{community_id}/search")
+async def search_community(community_id: str, q: str, mode: str = "hybrid", limit: int = 5):
+    """Run a retrieval query against a community's documents and memory, with its timing.
+
+    ``mode`` is ``hybrid``, ``lexical`` or ``vector``, so the modes can be compared on the same query.
+    """
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(SEARCH_MODES)}")
     
-    # Update community with documents
-    await db.communities.update_one(
-        {"_id": ObjectId(community_id)},
-        {"$push": {"documents": {"$each": uploaded_docs}}, "$set": {"updated_at": datetime.utcnow()}}
-    )
+    started = time.perf_counter()
+    try:
+        # Bypass the result cache so the timing reflects the retrieval mode itself
+        results = await search(community_id, q, n_results=max(1, min(limit, 20)), mode=mode, use_cache=False)
+    except Exception as e:
+        print(f"Error searching community {community_id}: {e}")
+        raise HTTPException(status_code=503, detail="Vector store unavailable")
     
-    return uploaded_docs
+    return {
+        "mode": results["mode"],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": [
+            {"id": entry_id, "document": text, "metadata": meta}
+            for entry_id, text, meta in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+        ] if results["ids"] else []
+    }
+
+@router.get("/{community_id}/documents/jobs/{job_id}")
+async def get_ingest_job(community_id: str, job_id: str):
+    """Get per-file stage, progress and throughput of a document ingestion job"""
+    job = await ingest_jobs.get_job(job_id)
+    if not job or job["communityId"] != community_id:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job_summary(job)
 
 @router.post("/{community_id}/deploy")
 async def deploy_community(community_id: str):  # current_user: dict = Depends(get_current_user) - skipped
@@ -468,6 +618,7 @@ async def deploy_community(community_id: str):  # current_user: dict = Depends(g
                         {"_id": ObjectId(community_id)},
                         {"$set": {"status": "active", "updated_at": datetime.utcnow()}}
                     )
+                    community_cache.invalidate(community_id)
                     if result.matched_count == 0:
                         print(f"Warning: Community {community_id} not found in database, but continuing deployment")
                     else:
@@ -511,7 +662,10 @@ async def post_now(community_id: str):
         # Get community from database
         db = get_db()
         if db:
-            community = await db.communities.find_one({"_id": ObjectId(community_id), "userId": ObjectId(current_user["id"])})
+            community = await db.communities.find_one(
+                {"_id": ObjectId(community_id), "userId": ObjectId(current_user["id"])},
+                COMMUNITY_PROJECTION
+            )
             if not community:
                 raise HTTPException(status_code=404, detail="Community not found")
         else:
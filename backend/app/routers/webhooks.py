@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 from typing import Dict, Any
-from bson import ObjectId
 from datetime import datetime
 
-from app.database import get_db
-from app.services.vector_store import search, add_memory
-from app.services.gemini_service import generate_response
+from app.services.vector_store import search
+from app.services.gemini_service import generate_response, RESPONSE_FALLBACK
 from app.services.platform_handlers import (
-    send_telegram_message
+    queue_telegram_message
 )
+from app.services.update_queue import update_queue
+from app.services.community_cache import community_cache
+from app.services.memory_buffer import memory_buffer
+from app.services.answer_cache import answer_cache
 
 router = APIRouter()
 
@@ -21,11 +23,7 @@ def is_mention(message: str, bot_name: str = None) -> bool:
 
 async def process_message(community_id: str, message: str, user_info: Dict[str, Any] = None):
     """Process incoming message and generate response if needed"""
-    db = get_db()
-    try:
-        community = await db.communities.find_one({"_id": ObjectId(community_id)})
-    except Exception:
-        return None
+    community = await community_cache.get(community_id)
     
     if not community or community.get("status") != "active":
         return None
@@ -34,58 +32,81 @@ async def process_message(community_id: str, message: str, user_info: Dict[str,
     if not is_mention(message):
         return None
     
-    # Search relevant context from vector store
-    search_results = await search(community_id, message, n_results=3)
-    context = search_results.get("documents", [])
-    
-    # Generate response
-    response = await generate_response(
-        community_config={
-            "platform": community["platform"],
-            "purpose": community.get("purpose", ""),
-            "moderationLevel": community.get("moderationLevel", "medium"),
-            "engagementStyle": community.get("engagementStyle", "friendly"),
-            "postingFrequency": community.get("postingFrequency", "moderate")
-        },
-        user_message=message,
-        context=context[0] if context else []
-    )
+    # Reuse the answer to a near-identical earlier question (opt-in per community)
+    cache_answers = answer_cache.enabled(community)
+    response = await answer_cache.lookup(community_id, community, message)
+    if response is None:
+        # Search relevant context from vector store
+        search_results = await search(community_id, message, n_results=3)
+        context = search_results.get("documents", [])
+        
+        # Generate response
+        try:
+            response = await generate_response(
+                community_config={
+                    "platform": community.get("platform", "telegram"),
+                    "purpose": community.get("purpose", ""),
+                    "moderationLevel": community.get("moderationLevel", "medium"),
+                    "engagementStyle": community.get("engagementStyle", "friendly"),
+                    "postingFrequency": community.get("postingFrequency", "moderate")
+                },
+                user_message=message,
+                context=context[0] if context else [],
+                fallback=not cache_answers
+            )
+            await answer_cache.store(community_id, community, message, response)
+        except Exception as e:
+            # Only raised when caching, so a canned reply is never stored as an answer
+            print(f"Error generating response: {e}")
+            response = RESPONSE_FALLBACK
     
-    # Store interaction in memory
-    memory_id = f"interaction_{datetime.utcnow().timestamp()}"
-    await add_memory(
+    # Store interaction in memory (written to the vector store in the next batch)
+    created_at = datetime.utcnow().timestamp()
+    memory_buffer.add(
         community_id=community_id,
-        memory_id=memory_id,
+        memory_id=f"interaction_{created_at}",
         text=f"User: {message}\nAI: {response}",
-        metadata={"type": "interaction"}
+        metadata={"type": "interaction", "created_at": created_at}
     )
     
     return response
 
+async def handle_telegram_update(community_id: str, data: Dict[str, Any]):
+    """Process a queued Telegram update and send the reply (runs on a queue worker)"""
+    # Telegram webhook format
+    if "message" not in data:
+        return
+    
+    message_obj = data["message"]
+    chat_id = message_obj["chat"]["id"]
+    message_text = message_obj.get("text", "")
+    user = message_obj.get("from", {})
+    
+    if not message_text:
+        return
+    
+    response = await process_message(community_id, message_text, user)
+    
+    if response:
+        community = await community_cache.get(community_id)
+        if community:
+            # Not awaited: a busy group's rate limit must not hold this update worker
+            queue_telegram_message(community["telegram_token"], str(chat_id), response)
+
 @router.post("/telegram/{community_id}")
 async def telegram_webhook(community_id: str, request: Request):
-    """Handle Telegram webhook"""
+    """Handle Telegram webhook - acknowledge immediately and process on the update queue"""
     try:
         data = await request.json()
-        
-        # Telegram webhook format
-        if "message" in data:
-            message_obj = data["message"]
-            chat_id = message_obj["chat"]["id"]
-            message_text = message_obj.get("text", "")
-            user = message_obj.get("from", {})
-            
-            if message_text:
-                response = await process_message(community_id, message_text, user)
-                
-                if response:
-                    db = get_db()
-                    community = await db.communities.find_one({"_id": ObjectId(community_id)})
-                    if community:
-                        await send_telegram_message(community["botToken"], str(chat_id), response)
-        
-        return JSONResponse(content={"ok": True})
     except Exception as e:
         print(f"Telegram webhook error: {e}")
-        return JSONResponse(content={"ok": False}, status_code=500)
+        return JSONResponse(content={"ok": False}, status_code=400)
+    
+    # A full queue drops the update rather than holding Telegram open
+    update_queue.enqueue(community_id, data)
+    return JSONResponse(content={"ok": True})
 
+@router.get("/queue/stats")
+async def queue_stats():
+    """Webhook queue depth, wait time and drop counts"""
+    return update_queue.get_stats()
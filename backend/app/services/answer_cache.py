@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+from app.services.vector_store import add_answer, find_similar_answer
+
+load_dotenv()
+
+# Cosine similarity a new question needs to an earlier one to reuse its answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_MAX_AGE_HOURS = float(os.getenv("ANSWER_CACHE_MAX_AGE_HOURS", "168"))
+
+# Community settings that shape a reply; changing any of them retires earlier answers
+RESPONSE_CONFIG_FIELDS = ("platform", "purpose", "moderationLevel", "engagementStyle", "postingFrequency")
+
+def config_fingerprint(community: Dict[str, Any]) -> str:
+    config = {field: community.get(field) for field in RESPONSE_CONFIG_FIELDS}
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+class AnswerCache:
+    """Opt-in (``answerCacheEnabled``) per-community cache of generated answers.
+
+    Answers are stored with the embedding of their question. A new question reuses the answer
+    of the most similar earlier one if the similarity reaches the community's
+    ``answerCacheThreshold`` (default ANSWER_CACHE_THRESHOLD), no document has been ingested
+    since (``content_updated_at``) and the reply settings are unchanged.
+    """
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+        self.errors = 0
+        self.hit_similarity = 0.0
+
+    @staticmethod
+    def enabled(community: Dict[str, Any]) -> bool:
+        return community.get("answerCacheEnabled") is True
+
+    @staticmethod
+    def valid_after(community: Dict[str, Any]) -> float:
+        """Entries created before this timestamp are not served"""
+        valid_after = datetime.utcnow() - timedelta(hours=ANSWER_CACHE_MAX_AGE_HOURS)
+        content_updated_at = community.get("content_updated_at")
+        if content_updated_at and content_updated_at > valid_after:
+            valid_after = content_updated_at
+        return valid_after.timestamp()
+
+    async def lookup(self, community_id: str, community: Dict[str, Any], question: str) -> Optional[str]:
+        if not self.enabled(community):
+            return None
+
+        self.lookups += 1
+        try:
+            match = await find_similar_answer(community_id, question, where={"$and": [
+                {"config": config_fingerprint(community)},
+                {"created_at": {"$gt": self.valid_after(community)}}
+            ]})
+            threshold = float(community.get("answerCacheThreshold") or ANSWER_CACHE_THRESHOLD)
+            if match is None or match["similarity"] < threshold:
+                return None
+        except Exception as e:
+            self.errors += 1
+            print(f"Warning: Answer cache lookup failed for community {community_id}: {e}")
+            return None
+        self.hits += 1
+        self.hit_similarity += match["similarity"]
+        return match["metadata"]["answer"]
+
+    async def store(self, community_id: str, community: Dict[str, Any], question: str, answer: str):
+        if not self.enabled(community):
+            return
+
+        try:
+            await add_answer(community_id, question, answer, {
+                "config": config_fingerprint(community),
+                "created_at": datetime.utcnow().timestamp()
+            })
+            self.stores += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"Warning: Could not store answer for community {community_id}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "threshold": ANSWER_CACHE_THRESHOLD,
+            "max_age_hours": ANSWER_CACHE_MAX_AGE_HOURS,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "avg_hit_similarity": round(self.hit_similarity / self.hits, 4) if self.hits else 0.0,
+            "stores": self.stores,
+            "errors": self.errors
+        }
+
+# Global instance
+answer_cache = AnswerCache()
@@ -0,0 +1,88 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app.database import get_db
+
+load_dotenv()
+
+COMMUNITY_CACHE_TTL = float(os.getenv("COMMUNITY_CACHE_TTL", "300"))
+COMMUNITY_CACHE_SIZE = int(os.getenv("COMMUNITY_CACHE_SIZE", "1000"))
+
+# Only the fields the message hot path needs - never the documents/scheduledPosts history
+CONFIG_PROJECTION = {
+    "status": 1,
+    "platform": 1,
+    "purpose": 1,
+    "moderationLevel": 1,
+    "engagementStyle": 1,
+    "postingFrequency": 1,
+    "telegram_token": 1,
+    "telegram_chat_id": 1,
+    "answerCacheEnabled": 1,
+    "answerCacheThreshold": 1,
+    "content_updated_at": 1
+}
+
+class CommunityConfigCache:
+    """In-process TTL/LRU cache of lean community configs.
+
+    Entries are invalidated explicitly when a community is changed through this process;
+    the TTL bounds staleness for changes made by other processes.
+    """
+
+    def __init__(self, ttl: float = COMMUNITY_CACHE_TTL, max_size: int = COMMUNITY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, community_id: str) -> Optional[Dict[str, Any]]:
+        """Return the community config, loading it from MongoDB on a miss"""
+        entry = self.entries.get(community_id)
+        if entry and entry[0] > time.monotonic():
+            self.entries.move_to_end(community_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        try:
+            db = get_db()
+            config = await db.communities.find_one({"_id": ObjectId(community_id)}, CONFIG_PROJECTION)
+        except Exception:
+            return None
+
+        if config is None:
+            self.entries.pop(community_id, None)
+            return None
+
+        config["_id"] = str(config["_id"])
+        self.entries[community_id] = (time.monotonic() + self.ttl, config)
+        self.entries.move_to_end(community_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return config
+
+    def invalidate(self, community_id: str):
+        self.entries.pop(community_id, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Global instance
+community_cache = CommunityConfigCache()
@@ -1,47 +1,160 @@
 import PyPDF2
 from docx import Document
-import io
-from typing import List, Dict
-import aiofiles
+import asyncio
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, List, Dict, Tuple
 import os
+from dotenv import load_dotenv
 
-async def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF file"""
+load_dotenv()
+
+# Parsing is CPU-bound, so it runs in worker processes instead of on the event loop.
+# Pages are extracted in batches and yielded as they arrive. The per-file timeout is
+# enforced inside the workers with SIGALRM (POSIX only, as in the Docker image).
+DOCUMENT_WORKERS = int(os.getenv("DOCUMENT_WORKERS", str(min(4, os.cpu_count() or 1))))
+DOCUMENT_EXTRACT_TIMEOUT = float(os.getenv("DOCUMENT_EXTRACT_TIMEOUT", "120"))
+PDF_PAGE_BATCH_SIZE = int(os.getenv("PDF_PAGE_BATCH_SIZE", "25"))
+# Seconds between repeated alarms once a file is over its budget, in case parser code catches one
+ALARM_REPEAT_SECONDS = 1.0
+
+executor = None
+
+def get_executor() -> ProcessPoolExecutor:
+    global executor
+    if executor is None:
+        # Workers come from a fork server: forking this process (Chroma, ONNX and HTTP client
+        # threads) could copy a held lock into the child and deadlock it
+        executor = ProcessPoolExecutor(max_workers=DOCUMENT_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return executor
+
+def shutdown_executor():
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+
+class DocumentTimeoutError(Exception):
+    """Raised when extracting a file takes longer than DOCUMENT_EXTRACT_TIMEOUT"""
+    pass
+
+class _ExtractionAlarm(BaseException):
+    """Raised in a worker by SIGALRM; not an Exception, so ``except Exception`` in parser code cannot swallow it"""
+    pass
+
+# Worker-process functions (must be top-level so they can be pickled)
+
+_alarm_armed = False
+
+def _on_alarm(signum, frame):
+    if _alarm_armed:
+        raise _ExtractionAlarm()
+
+def _timed(timeout: float, func, *args) -> Tuple[Any, float]:
+    """Run func in this worker process, interrupting it after timeout seconds of work.
+
+    The timer starts when the worker picks the call up, so time spent queued behind other
+    files is not charged, and an interrupted parse frees its worker instead of running on.
+    The alarm repeats every ALARM_REPEAT_SECONDS until the call returns.
+    """
+    global _alarm_armed
+    signal.signal(signal.SIGALRM, _on_alarm)
+    started = time.monotonic()
     try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+        _alarm_armed = True
+        signal.setitimer(signal.ITIMER_REAL, timeout, ALARM_REPEAT_SECONDS)
+        try:
+            return func(*args), time.monotonic() - started
+        finally:
+            _alarm_armed = False
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    except _ExtractionAlarm:
+        _alarm_armed = False
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        raise DocumentTimeoutError(f"Extraction timed out after {DOCUMENT_EXTRACT_TIMEOUT}s") from None
+
+def _pdf_page_count(file_path: str) -> int:
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def _pdf_extract_pages(file_path: str, start: int, end: int) -> List[str]:
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def _docx_extract_text(file_path: str) -> str:
+    doc = Document(file_path)
+    return "\n".join(paragraph.text for paragraph in doc.paragraphs)
+
+async def _run(remaining: float, func, *args) -> Tuple[Any, float]:
+    """Run func in the process pool with the file's remaining time budget; returns (result, seconds worked)"""
+    if remaining <= 0:
+        raise DocumentTimeoutError(f"Extraction timed out after {DOCUMENT_EXTRACT_TIMEOUT}s")
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), _timed, remaining, func, *args)
+
+async def iter_pdf_pages(file_path: str) -> AsyncIterator[str]:
+    """Yield the text of each page of a PDF file, extracted in batches in the process pool.
+
+    Parse errors are raised to the caller, and DocumentTimeoutError once the batches have worked
+    for DOCUMENT_EXTRACT_TIMEOUT seconds in total.
+    """
+    remaining = DOCUMENT_EXTRACT_TIMEOUT
+    try:
+        page_count, elapsed = await _run(remaining, _pdf_page_count, file_path)
+        remaining -= elapsed
+        for start in range(0, page_count, PDF_PAGE_BATCH_SIZE):
+            end = min(start + PDF_PAGE_BATCH_SIZE, page_count)
+            pages, elapsed = await _run(remaining, _pdf_extract_pages, file_path, start, end)
+            remaining -= elapsed
+            for page_text in pages:
+                yield page_text
+    except DocumentTimeoutError:
+        print(f"Error extracting PDF: timed out after {DOCUMENT_EXTRACT_TIMEOUT}s ({file_path})")
+        raise
     except Exception as e:
         print(f"Error extracting PDF: {e}")
-        return ""
+        raise
+
+async def extract_pages_from_pdf(file_path: str) -> List[str]:
+    """Extract the text of each page of a PDF file"""
+    return [page async for page in iter_pdf_pages(file_path)]
+
+async def extract_text_from_pdf(file_path: str) -> str:
+    """Extract text from PDF file"""
+    pages = await extract_pages_from_pdf(file_path)
+    return "\n".join(pages)
 
 async def extract_text_from_docx(file_path: str) -> str:
     """Extract text from Word document"""
     try:
-        doc = Document(file_path)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+        text, _ = await _run(DOCUMENT_EXTRACT_TIMEOUT, _docx_extract_text, file_path)
         return text
+    except DocumentTimeoutError:
+        print(f"Error extracting DOCX: timed out after {DOCUMENT_EXTRACT_TIMEOUT}s ({file_path})")
+        raise
     except Exception as e:
         print(f"Error extracting DOCX: {e}")
-        return ""
+        raise
 
-async def process_document(file_path: str, filename: str) -> Dict[str, str]:
-    """Process document and extract text"""
+async def iter_document_pages(file_path: str, filename: str) -> AsyncIterator[str]:
+    """Yield the pages of a supported document as they are extracted (a Word document is one page)"""
     file_ext = os.path.splitext(filename)[1].lower()
-    
+
     if file_ext == '.pdf':
-        text = await extract_text_from_pdf(file_path)
+        async for page in iter_pdf_pages(file_path):
+            yield page
     elif file_ext in ['.doc', '.docx']:
-        text = await extract_text_from_docx(file_path)
-    else:
-        text = ""
-    
+        yield await extract_text_from_docx(file_path)
+
+async def process_document(file_path: str, filename: str) -> Dict[str, Any]:
+    """Process document and extract its text page by page (extraction errors are raised)"""
+    file_ext = os.path.splitext(filename)[1].lower()
+    pages = [page async for page in iter_document_pages(file_path, filename)]
+
     return {
         "filename": filename,
-        "text": text,
+        "pages": pages,
         "file_type": file_ext
     }
-
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite3")
+# Vectors kept in memory and on disk; 0 disables that tier
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+EMBEDDING_CACHE_DISK_MAX = int(os.getenv("EMBEDDING_CACHE_DISK_MAX", "500000"))
+
+# Inserts between checks of the on-disk entry limit
+PRUNE_EVERY = 1000
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+class EmbeddingCache:
+    """Two-tier embedding cache keyed by (model id, content hash).
+
+    Recent vectors are held as float32 arrays in an in-memory LRU; all vectors are also written to
+    a SQLite file so they survive restarts. The oldest rows are dropped past EMBEDDING_CACHE_DISK_MAX.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, size: int = EMBEDDING_CACHE_SIZE, disk_max: int = EMBEDDING_CACHE_DISK_MAX):
+        self.path = path
+        self.size = size
+        self.disk_max = disk_max
+        self.memory: "OrderedDict[str, array]" = OrderedDict()
+        self.memory_bytes = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._inserts = 0
+        # SQLite reads and writes are kept off the event loop and out of the model's executor
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-cache")
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self.disk_max <= 0:
+            return None
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        return self._db
+
+    def _remember(self, key: str, vector: array):
+        if self.size <= 0:
+            return
+        previous = self.memory.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= len(previous) * previous.itemsize
+        self.memory[key] = vector
+        self.memory_bytes += len(vector) * vector.itemsize
+        while len(self.memory) > self.size:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted) * evicted.itemsize
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, array]:
+        found = {}
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return found
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob)
+        return found
+
+    def _write_disk(self, vectors: Dict[str, array]):
+        try:
+            self._write_rows(vectors)
+        except Exception as e:
+            self.disk_errors += 1
+            print(f"Warning: Could not write embedding cache: {e}")
+
+    def _write_rows(self, vectors: Dict[str, array]):
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vector.tobytes()) for key, vector in vectors.items()]
+            )
+            self._inserts += len(vectors)
+            if self._inserts >= PRUNE_EVERY:
+                self._inserts = 0
+                db.execute(
+                    "DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?",
+                    (self.disk_max,)
+                )
+            db.commit()
+
+    async def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Cached vectors for the given keys (missing keys are left out)"""
+        found: Dict[str, List[float]] = {}
+        missing = []
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is not None:
+                self.memory.move_to_end(key)
+                found[key] = vector.tolist()
+                self.memory_hits += 1
+            else:
+                missing.append(key)
+
+        if missing and self.disk_max <= 0:
+            self.misses += len(missing)
+        elif missing:
+            try:
+                on_disk = await asyncio.get_running_loop().run_in_executor(self.executor, self._read_disk, missing)
+            except Exception as e:
+                self.disk_errors += 1
+                print(f"Warning: Could not read embedding cache: {e}")
+                on_disk = {}
+            for key, vector in on_disk.items():
+                self._remember(key, vector)
+                found[key] = vector.tolist()
+            self.disk_hits += len(on_disk)
+            self.misses += len(missing) - len(on_disk)
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]):
+        """Cache vectors in memory now and write them to disk in the background"""
+        packed = {key: array("f", vector) for key, vector in vectors.items()}
+        for key, vector in packed.items():
+            self._remember(key, vector)
+        if self.disk_max > 0:
+            self.executor.submit(self._write_disk, packed)
+
+    def close(self):
+        """Finish pending disk writes and close the database"""
+        self.executor.shutdown(wait=True)
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        try:
+            disk_bytes = sum(
+                os.path.getsize(self.path + suffix)
+                for suffix in ("", "-wal")
+                if os.path.exists(self.path + suffix)
+            )
+        except OSError:
+            disk_bytes = 0
+        return {
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory_bytes,
+            "disk_bytes": disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "disk_errors": self.disk_errors
+        }
+
+# Global instance
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+from dotenv import load_dotenv
+
+from app.services.embedding_cache import embedding_cache, cache_key
+
+load_dotenv()
+
+# Requests arriving within EMBEDDING_BATCH_WINDOW_MS of each other share one forward pass
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))
+# Concurrent forward passes; on CPU-only hosts one pass already uses every core
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+
+# Chroma's default embedding function, so vectors match collections embedded by Chroma itself
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+executor = ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS, thread_name_prefix="embed")
+_model = None
+
+def _get_model():
+    global _model
+    if _model is None:
+        from chromadb.utils import embedding_functions
+        _model = embedding_functions.DefaultEmbeddingFunction()
+    return _model
+
+def _embed_sync(texts: List[str]) -> List[List[float]]:
+    return [[float(value) for value in vector] for vector in _get_model()(texts)]
+
+class EmbeddingService:
+    """Coalesces concurrent embedding requests into batched model calls.
+
+    Each worker takes the first waiting text, gathers whatever else arrives within the batch window
+    (up to EMBEDDING_MAX_BATCH texts) and embeds them in one forward pass, so throughput grows with
+    concurrency instead of paying a model call per text.
+    """
+
+    def __init__(self, max_batch: int = EMBEDDING_MAX_BATCH, window_ms: float = EMBEDDING_BATCH_WINDOW_MS, workers: int = EMBEDDING_WORKERS):
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.worker_tasks: List[asyncio.Task] = []
+
+        self.texts = 0
+        self.batches = 0
+        self.deduplicated = 0
+        self.failed = 0
+        self.total_batch_seconds = 0.0
+        self.max_batch_seconds = 0.0
+
+    async def start(self):
+        for _ in range(self.workers):
+            self.worker_tasks.append(asyncio.create_task(self._worker()))
+        print(f"✅ Embedding service started (batch {self.max_batch}, window {self.window * 1000:.0f}ms)")
+
+    async def stop(self):
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, serving cached vectors and sharing model calls with other requests in flight"""
+        if not texts:
+            return []
+        
+        keys = [cache_key(EMBEDDING_MODEL, text) for text in texts]
+        vectors = await embedding_cache.get_many(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in vectors))
+        if missing:
+            computed = dict(zip((cache_key(EMBEDDING_MODEL, text) for text in missing), await self._embed_uncached(missing)))
+            embedding_cache.put_many(computed)
+            vectors.update(computed)
+        return [vectors[key] for key in keys]
+
+    async def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        if not self.worker_tasks:
+            # Service not running (e.g. outside the app lifespan): embed directly
+            return await asyncio.get_running_loop().run_in_executor(executor, _embed_sync, texts)
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self.queue.put_nowait((text, future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await self.queue.get()]
+        if self.queue.qsize() < self.max_batch - 1 and self.window > 0:
+            # Give concurrent requests a moment to join this forward pass
+            await asyncio.sleep(self.window)
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (cancelled) are dropped; identical texts are embedded once
+            batch = [(text, future) for text, future in batch if not future.done()]
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            if not unique:
+                continue
+
+            started = time.perf_counter()
+            try:
+                vectors = await asyncio.get_running_loop().run_in_executor(executor, _embed_sync, unique)
+            except Exception as e:
+                self.failed += len(batch)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            elapsed = time.perf_counter() - started
+            self.batches += 1
+            self.texts += len(batch)
+            self.deduplicated += len(batch) - len(unique)
+            self.total_batch_seconds += elapsed
+            self.max_batch_seconds = max(self.max_batch_seconds, elapsed)
+
+            by_text = dict(zip(unique, vectors))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "model": EMBEDDING_MODEL,
+            "max_batch": self.max_batch,
+            "window_ms": self.window * 1000,
+            "workers": len(self.worker_tasks),
+            "queued": self.queue.qsize(),
+            "texts": self.texts,
+            "batches": self.batches,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+            "avg_batch_size": round(self.texts / self.batches, 1) if self.batches else 0.0,
+            "avg_batch_ms": round(self.total_batch_seconds / self.batches * 1000, 2) if self.batches else 0.0,
+            "max_batch_ms": round(self.max_batch_seconds * 1000, 2),
+            "texts_per_second": round(self.texts / self.total_batch_seconds, 1) if self.total_batch_seconds else 0.0
+        }
+
+def shutdown_executor():
+    executor.shutdown(wait=False, cancel_futures=True)
+
+# Global instance
+embedding_service = EmbeddingService()
@@ -0,0 +1,98 @@
+import aiofiles
+import hashlib
+import json
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+from fastapi import UploadFile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(50 * 1024 * 1024)))
+
+# Uploads are stored content-addressed: one blob per SHA-256, plus its extracted pages
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+TEXT_DIR = os.path.join(UPLOAD_DIR, "text")
+TMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+
+for directory in (UPLOAD_DIR, BLOB_DIR, TEXT_DIR, TMP_DIR):
+    os.makedirs(directory, exist_ok=True)
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_SIZE"""
+    pass
+
+async def save_upload(upload: UploadFile, file_path: str, max_size: int = MAX_UPLOAD_SIZE) -> Dict[str, Any]:
+    """Copy an upload to disk chunk by chunk, hashing and counting bytes as it streams.
+
+    Raises FileTooLargeError (and removes the partial file) as soon as the size limit is passed.
+    """
+    # Reject before reading anything when the client declared the size up front
+    declared_size = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > max_size:
+        raise FileTooLargeError(f"{upload.filename} is larger than {max_size} bytes")
+
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(file_path, 'wb') as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(f"{upload.filename} is larger than {max_size} bytes")
+                sha256.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    return {"size": size, "sha256": sha256.hexdigest()}
+
+def blob_path(sha256: str, filename: str) -> str:
+    return os.path.join(BLOB_DIR, f"{sha256}{os.path.splitext(filename)[1].lower()}")
+
+async def store_upload(upload: UploadFile, max_size: int = MAX_UPLOAD_SIZE) -> Dict[str, Any]:
+    """Stream an upload into the content-addressed blob store.
+
+    If a blob with the same hash already exists the new copy is discarded and ``duplicate`` is True.
+    """
+    tmp_path = os.path.join(TMP_DIR, str(uuid.uuid4()))
+    saved = await save_upload(upload, tmp_path, max_size)
+
+    path = blob_path(saved["sha256"], upload.filename)
+    duplicate = os.path.exists(path)
+    if duplicate:
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, path)
+
+    return {**saved, "path": path, "duplicate": duplicate}
+
+def _text_path(sha256: str) -> str:
+    return os.path.join(TEXT_DIR, f"{sha256}.json")
+
+async def load_extracted_pages(sha256: str) -> Optional[List[str]]:
+    """Return the cached extracted pages for a blob, or None if it has not been processed"""
+    path = _text_path(sha256)
+    if not os.path.exists(path):
+        return None
+    try:
+        async with aiofiles.open(path, 'r', encoding='utf-8') as f:
+            return json.loads(await f.read())
+    except Exception as e:
+        print(f"Warning: Could not read cached text for {sha256}: {e}")
+        return None
+
+async def save_extracted_pages(sha256: str, pages: List[str]):
+    path = _text_path(sha256)
+    tmp_path = f"{path}.{uuid.uuid4()}.tmp"
+    async with aiofiles.open(tmp_path, 'w', encoding='utf-8') as f:
+        await f.write(json.dumps(pages))
+    os.replace(tmp_path, path)
@@ -1,5 +1,7 @@
 import google.generativeai as genai
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from typing import List, Dict, Any
 
@@ -7,6 +9,12 @@ load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "KEY HERE")
 
+# The SDK call is synchronous, so it runs on a dedicated thread pool. The semaphore caps
+# in-flight requests; callers waiting longer than GEMINI_QUEUE_TIMEOUT get GeminiBusyError.
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "30"))
+GEMINI_REQUEST_TIMEOUT = float(os.getenv("GEMINI_REQUEST_TIMEOUT", "60"))
+
 # Try to use the latest model, fallback to gemini-pro if needed
 model = None
 if GEMINI_API_KEY and GEMINI_API_KEY != "KEY HERE":
@@ -29,6 +37,70 @@ if GEMINI_API_KEY and GEMINI_API_KEY != "KEY HERE":
 else:
     print("Gemini API key not configured. Using fallback messages.")
 
+executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+_semaphore = None
+_stats = {"in_flight": 0, "waiting": 0, "completed": 0, "failed": 0, "queue_timeouts": 0, "request_timeouts": 0}
+
+class GeminiBusyError(Exception):
+    """Raised when no LLM slot frees up within GEMINI_QUEUE_TIMEOUT"""
+    pass
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _semaphore
+
+def _release_slot(semaphore: asyncio.Semaphore):
+    _stats["in_flight"] -= 1
+    semaphore.release()
+
+def _call_in_loop(loop: asyncio.AbstractEventLoop, callback, *args):
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        # The loop closed during shutdown; there is nothing left to release
+        pass
+
+def _generate_sync(prompt: str) -> str:
+    return model.generate_content(prompt).text
+
+async def generate_text(prompt: str) -> str:
+    """Run a Gemini generation off the event loop, bounded by GEMINI_MAX_CONCURRENCY"""
+    if not model:
+        raise Exception("Gemini model not initialized")
+    
+    semaphore = _get_semaphore()
+    _stats["waiting"] += 1
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=GEMINI_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _stats["queue_timeouts"] += 1
+        raise GeminiBusyError(f"No Gemini slot available within {GEMINI_QUEUE_TIMEOUT}s")
+    finally:
+        _stats["waiting"] -= 1
+    
+    _stats["in_flight"] += 1
+    loop = asyncio.get_running_loop()
+    future = executor.submit(_generate_sync, prompt)
+    # A timed-out request keeps its thread busy, so the slot is freed when the thread
+    # finishes rather than when the caller stops waiting
+    future.add_done_callback(lambda _: _call_in_loop(loop, _release_slot, semaphore))
+    try:
+        text = await asyncio.wait_for(asyncio.wrap_future(future), timeout=GEMINI_REQUEST_TIMEOUT)
+        _stats["completed"] += 1
+        return text
+    except asyncio.TimeoutError:
+        _stats["request_timeouts"] += 1
+        _stats["failed"] += 1
+        raise
+    except Exception:
+        _stats["failed"] += 1
+        raise
+
+def get_gemini_stats() -> Dict[str, Any]:
+    return {"max_concurrency": GEMINI_MAX_CONCURRENCY, **_stats}
+
 async def generate_setup_intro() -> str:
     """Generate AI assistant introduction message"""
     if not model:
@@ -39,21 +111,29 @@ async def generate_setup_intro() -> str:
     Write a brief, welcoming introduction (2-3 sentences) that explains you'll ask questions to understand their community needs."""
     
     try:
-        response = model.generate_content(prompt)
+        text = await generate_text(prompt)
         print("✅ Gemini API call successful")
-        return response.text
+        return text
     except Exception as e:
         print(f"❌ Error generating intro with Gemini API: {e}")
         print(f"   Error type: {type(e).__name__}")
         return "Welcome! I'm your AI Community Manager assistant. I'll help you configure your community management system."
 
+RESPONSE_FALLBACK = "I apologize, but I'm having trouble processing that right now. Please try again."
+
 async def generate_response(
     community_config: Dict[str, Any],
     user_message: str,
-    context: List[str] = None
+    context: List[str] = None,
+    fallback: bool = True
 ) -> str:
-    """Generate AI response based on community configuration and context"""
+    """Generate AI response based on community configuration and context.
+
+    With ``fallback=False`` errors are raised instead of returning a canned reply.
+    """
     if not model:
+        if not fallback:
+            raise Exception("Gemini model not initialized")
         return "I'm here to help! (Gemini API not configured)"
     
     context_text = "\n".join(context) if context else "No additional context."
@@ -75,11 +155,12 @@ Respond in a {community_config.get('engagementStyle', 'friendly')} style, keepin
 Keep your response concise and helpful."""
     
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return await generate_text(prompt)
     except Exception as e:
+        if not fallback:
+            raise
         print(f"Error generating response: {e}")
-        return "I apologize, but I'm having trouble processing that right now. Please try again."
+        return RESPONSE_FALLBACK
 
 async def generate_scheduled_post(community_config: Dict[str, Any], topic: str = None) -> str:
     """Generate scheduled post content"""
@@ -95,8 +176,7 @@ Keep it engaging, relevant to the community purpose, and match the {community_co
 Maximum 200 words."""
     
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return await generate_text(prompt)
     except Exception as e:
         print(f"Error generating post: {e}")
         return "Hello everyone! Hope you're having a great day. Let's keep the conversation going! 🚀"
@@ -0,0 +1,72 @@
+import httpx
+import os
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "false").lower() in ("1", "true", "yes")
+
+client: Optional[httpx.AsyncClient] = None
+
+def _http2_available() -> bool:
+    if not HTTP_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        print("⚠️  HTTP_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+        return False
+
+def _create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=_http2_available(),
+        timeout=httpx.Timeout(HTTP_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        )
+    )
+
+async def init_http_client():
+    """Create the shared, pooled HTTP client for this process"""
+    global client
+    if client is None:
+        client = _create_client()
+        print(f"✅ HTTP client initialized (max {HTTP_MAX_CONNECTIONS} connections, {HTTP_MAX_KEEPALIVE} keep-alive)")
+
+async def close_http_client():
+    global client
+    if client is not None:
+        await client.aclose()
+        client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it if the lifespan has not run (e.g. scripts)"""
+    global client
+    if client is None:
+        client = _create_client()
+    return client
+
+async def telegram_request(
+    bot_token: str,
+    method: str,
+    params: Dict[str, Any] = None,
+    json: Dict[str, Any] = None,
+    timeout: float = None
+) -> httpx.Response:
+    """Call a Telegram Bot API method over the shared connection pool"""
+    return await get_http_client().post(
+        f"{TELEGRAM_API_URL}/bot{bot_token}/{method}",
+        params=params,
+        json=json,
+        timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+    )
@@ -0,0 +1,308 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from app.database import get_db
+from app.services.community_cache import community_cache
+from app.services.document_processor import process_document
+from app.services.file_storage import load_extracted_pages, save_extracted_pages
+from app.services.leases import lease_manager, ingest_job_lease
+from app.services.vector_store import add_document, copy_document, delete_document, find_document_chunks
+
+load_dotenv()
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+# File stages, in pipeline order. Uploads are saved to the blob store during the request.
+STAGES = ["saved", "extracting", "chunking", "embedding", "recording", "done"]
+FAILED = "failed"
+
+class IngestJobManager:
+    """Runs document ingestion jobs (extract -> chunk -> embed -> record) on a bounded worker pool.
+
+    Job state is kept in memory and written through to the ``ingest_jobs`` collection, so
+    unfinished files are picked up again after a restart. Each job is leased to the worker
+    running it; the leader adopts jobs whose worker has died.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS):
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.worker_tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        for _ in range(self.workers):
+            self.worker_tasks.append(asyncio.create_task(self._worker()))
+        await self._resume_unfinished()
+        self.worker_tasks.append(asyncio.create_task(self._adopt_orphans()))
+        print(f"✅ Document ingest workers started ({self.workers} workers)")
+
+    async def stop(self):
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+
+    async def create_job(self, community_id: str, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Create a job for files already saved to the blob store and queue them for processing.
+
+        Files passed with an ``error`` (rejected during upload) are recorded as failed and not queued.
+        """
+        now = datetime.utcnow()
+        job = {
+            "_id": str(uuid.uuid4()),
+            "communityId": community_id,
+            "status": "queued",
+            "files": [{
+                "document_id": str(uuid.uuid4()),
+                "filename": f["filename"],
+                "path": f["path"],
+                "size": f["size"],
+                "sha256": f["sha256"],
+                "stage": FAILED if f.get("error") else "saved",
+                "progress": 0.0,
+                "chunks": 0,
+                "deduplicated": False,
+                "error": f.get("error"),
+                "started_at": None,
+                "finished_at": now if f.get("error") else None
+            } for f in files],
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None
+        }
+        self.jobs[job["_id"]] = job
+        await lease_manager.acquire(ingest_job_lease(job["_id"]))
+        await self._persist(job)
+
+        queued = [index for index, file in enumerate(job["files"]) if file["stage"] != FAILED]
+        for index in queued:
+            self.queue.put_nowait((job["_id"], index))
+        if not queued:
+            await self._finish_job(job)
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            try:
+                job = await get_db().ingest_jobs.find_one({"_id": job_id})
+            except Exception:
+                job = None
+        return job
+
+    async def _resume_unfinished(self):
+        try:
+            db = get_db()
+            jobs = await db.ingest_jobs.find({"status": {"$in": ["queued", "running"]}}).to_list(length=None)
+        except Exception as e:
+            print(f"⚠️  Could not resume ingest jobs: {e}")
+            return
+
+        resumed = 0
+        for job in jobs:
+            # Skip jobs being processed here or by another live worker
+            if job["_id"] in self.jobs or not await lease_manager.acquire(ingest_job_lease(job["_id"])):
+                continue
+            resumed += 1
+            self.jobs[job["_id"]] = job
+            for index, file in enumerate(job["files"]):
+                if file["stage"] not in ("done", FAILED):
+                    if file["stage"] in ("embedding", "recording"):
+                        # Drop chunks from the interrupted run so the file is not mistaken for a duplicate
+                        try:
+                            await delete_document(job["communityId"], file["document_id"])
+                        except Exception as e:
+                            print(f"Warning: Could not clear partial chunks for {file['filename']}: {e}")
+                    file["stage"] = "saved"
+                    file["progress"] = 0.0
+                    self.queue.put_nowait((job["_id"], index))
+        if resumed:
+            print(f"Resumed {resumed} unfinished ingest jobs")
+
+    async def _adopt_orphans(self):
+        """On the leader, periodically take over jobs whose worker stopped renewing their lease"""
+        while True:
+            await asyncio.sleep(lease_manager.ttl)
+            if lease_manager.is_leader:
+                await self._resume_unfinished()
+
+    async def _worker(self):
+        while True:
+            job_id, index = await self.queue.get()
+            try:
+                await self._process_file(self.jobs[job_id], index)
+            except Exception as e:
+                print(f"Error in ingest worker for job {job_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _set_stage(self, job: Dict[str, Any], index: int, stage: str, progress: float = None, **fields):
+        file = job["files"][index]
+        file["stage"] = stage
+        file["progress"] = progress if progress is not None else STAGES.index(stage) / (len(STAGES) - 1)
+        file.update(fields)
+        job["updated_at"] = datetime.utcnow()
+        await self._persist(job)
+
+    async def _process_file(self, job: Dict[str, Any], index: int):
+        file = job["files"][index]
+        community_id = job["communityId"]
+        if job["status"] == "queued":
+            job["status"] = "running"
+        file["started_at"] = datetime.utcnow()
+        started = time.perf_counter()
+
+        try:
+            metadata = {"filename": file["filename"], "file_type": os.path.splitext(file["filename"])[1].lower()}
+
+            # Same content already indexed for this community: only record the upload
+            existing = await find_document_chunks(file["sha256"], community_id=community_id)
+            if existing["ids"]:
+                file["document_id"] = existing["metadatas"][0]["document_id"]
+                ingest = {"chunks": len(existing["ids"]), "reused": True}
+            else:
+                # Same content indexed for another community: reuse its embeddings
+                ingest = None
+                source = await self._find_source(community_id, file["sha256"])
+                if source:
+                    ingest = await copy_document(community_id, file["document_id"], file["sha256"], source, metadata)
+
+            if ingest is None:
+                await self._set_stage(job, index, "extracting")
+                pages = await load_extracted_pages(file["sha256"])
+                if pages is None:
+                    if not os.path.exists(file["path"]):
+                        # e.g. a job adopted from another node whose uploads directory is not shared
+                        raise FileNotFoundError(f"Uploaded file is not available on this node: {file['path']}")
+                    # Extraction errors and timeouts propagate, so only a complete parse is cached
+                    doc_data = await process_document(file["path"], file["filename"])
+                    pages = doc_data["pages"]
+                    await save_extracted_pages(file["sha256"], pages)
+                if not any(page.strip() for page in pages):
+                    raise ValueError("No text could be extracted from this file")
+
+                await self._set_stage(job, index, "chunking")
+
+                async def on_progress(done: int, total: int):
+                    # Embedding spans the progress between "chunking" and "recording"
+                    low = STAGES.index("embedding") / (len(STAGES) - 1)
+                    high = STAGES.index("recording") / (len(STAGES) - 1)
+                    await self._set_stage(job, index, "embedding", low + (high - low) * done / total, chunks=done)
+
+                ingest = await add_document(
+                    community_id=community_id,
+                    document_id=file["document_id"],
+                    pages=pages,
+                    metadata={**metadata, "content_hash": file["sha256"]},
+                    on_progress=on_progress
+                )
+
+            await self._set_stage(job, index, "recording", chunks=ingest["chunks"], deduplicated=ingest.get("reused", False))
+            await self._record_document(community_id, file)
+            await self._set_stage(job, index, "done", finished_at=datetime.utcnow(), seconds=round(time.perf_counter() - started, 3))
+        except Exception as e:
+            print(f"Error ingesting {file['filename']} for community {community_id}: {e}")
+            await self._set_stage(job, index, FAILED, progress=file["progress"], error=str(e), finished_at=datetime.utcnow())
+
+        if all(f["stage"] in ("done", FAILED) for f in job["files"]):
+            await self._finish_job(job)
+
+    async def _find_source(self, community_id: str, sha256: str) -> Optional[str]:
+        """Another community that already has a file with this content indexed"""
+        try:
+            db = get_db()
+            document = await db.documents.find_one(
+                {"sha256": sha256, "communityId": {"$ne": community_id}},
+                {"communityId": 1}
+            )
+        except Exception as e:
+            print(f"Warning: Could not look up existing copies of {sha256}: {e}")
+            return None
+        return document["communityId"] if document else None
+
+    async def _record_document(self, community_id: str, file: Dict[str, Any]):
+        db = get_db()
+        await db.documents.insert_one({
+            "communityId": community_id,
+            "id": file["document_id"],
+            "filename": file["filename"],
+            "size": file["size"],
+            "sha256": file["sha256"],
+            "chunks": file["chunks"],
+            "deduplicated": file["deduplicated"],
+            "uploaded_at": datetime.utcnow()
+        })
+        now = datetime.utcnow()
+        # content_updated_at retires answers cached before this document was added
+        await db.communities.update_one(
+            {"_id": ObjectId(community_id)},
+            {"$set": {"updated_at": now, "content_updated_at": now}}
+        )
+        community_cache.invalidate(community_id)
+
+    async def _finish_job(self, job: Dict[str, Any]):
+        failed = any(f["stage"] == FAILED for f in job["files"])
+        job["status"] = "failed" if failed else "completed"
+        job["finished_at"] = datetime.utcnow()
+        job["updated_at"] = job["finished_at"]
+        if await self._persist(job):
+            # Finished jobs are served from MongoDB from now on
+            self.jobs.pop(job["_id"], None)
+        await lease_manager.release(ingest_job_lease(job["_id"]))
+
+    async def _persist(self, job: Dict[str, Any]) -> bool:
+        try:
+            db = get_db()
+            await db.ingest_jobs.replace_one({"_id": job["_id"]}, job, upsert=True)
+            return True
+        except Exception as e:
+            print(f"Warning: Could not persist ingest job {job['_id']}: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self.worker_tasks),
+            "queued_files": self.queue.qsize(),
+            "active_jobs": len(self.jobs)
+        }
+
+def job_summary(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job with per-file progress and throughput"""
+    files = []
+    for file in job["files"]:
+        seconds = file.get("seconds")
+        if seconds is None and file.get("started_at"):
+            seconds = (datetime.utcnow() - file["started_at"]).total_seconds()
+        files.append({
+            "document_id": file["document_id"],
+            "filename": file["filename"],
+            "size": file["size"],
+            "stage": file["stage"],
+            "progress": round(file["progress"], 3),
+            "chunks": file["chunks"],
+            "deduplicated": file["deduplicated"],
+            "error": file["error"],
+            "seconds": round(seconds, 3) if seconds is not None else None,
+            "chunks_per_second": round(file["chunks"] / seconds, 1) if seconds else None,
+            "bytes_per_second": round(file["size"] / seconds) if seconds and file["stage"] == "done" else None
+        })
+
+    return {
+        "job_id": job["_id"],
+        "community_id": job["communityId"],
+        "status": job["status"],
+        "progress": round(sum(f["progress"] for f in files) / len(files), 3) if files else 1.0,
+        "files": files,
+        "created_at": job["created_at"],
+        "finished_at": job.get("finished_at")
+    }
+
+# Global instance
+ingest_jobs = IngestJobManager()
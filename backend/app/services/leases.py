@@ -0,0 +1,153 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Set
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+from app.database import get_db
+
+load_dotenv()
+
+LEASE_TTL = float(os.getenv("LEASE_TTL", "30"))
+LEASE_HEARTBEAT = float(os.getenv("LEASE_HEARTBEAT", "10"))
+
+LEADER_LEASE = "leader"
+
+class LeaseManager:
+    """MongoDB-backed leases that give one backend worker ownership of a named resource.
+
+    A lease is held until its owner stops renewing it; after LEASE_TTL seconds without a
+    heartbeat any other worker may take it over. The ``leader`` lease elects one worker for
+    cluster-wide housekeeping. Without a database every lease is granted locally.
+    """
+
+    def __init__(self, ttl: float = LEASE_TTL, heartbeat: float = LEASE_HEARTBEAT):
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.held: Set[str] = set()
+        self.renewed_at = datetime.utcnow()
+        self.task = None
+
+        self.acquired = 0
+        self.lost = 0
+
+    async def start(self):
+        try:
+            db = get_db()
+            await db.leases.create_index("expires_at", expireAfterSeconds=int(self.ttl * 10))
+        except Exception as e:
+            print(f"⚠️  Lease index not created: {e}")
+        await self.acquire(LEADER_LEASE)
+        self.task = asyncio.create_task(self._heartbeat())
+        print(f"✅ Lease manager started (worker {self.worker_id}, leader: {self.is_leader})")
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        for name in list(self.held):
+            await self.release(name)
+
+    @property
+    def is_leader(self) -> bool:
+        return LEADER_LEASE in self.held
+
+    def owns(self, name: str) -> bool:
+        return name in self.held
+
+    async def acquire(self, name: str) -> bool:
+        """Take or renew a lease. Returns False if another live worker holds it."""
+        try:
+            db = get_db()
+        except Exception:
+            self.held.add(name)
+            return True
+
+        now = datetime.utcnow()
+        try:
+            await db.leases.update_one(
+                {"_id": name, "$or": [{"owner": self.worker_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.worker_id, "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The lease exists and belongs to someone else
+            self.held.discard(name)
+            return False
+        except Exception as e:
+            print(f"Warning: Could not acquire lease {name}: {e}")
+            return False
+
+        if name not in self.held:
+            self.held.add(name)
+            self.acquired += 1
+        return True
+
+    async def release(self, name: str):
+        self.held.discard(name)
+        try:
+            db = get_db()
+            await db.leases.delete_one({"_id": name, "owner": self.worker_id})
+        except Exception:
+            pass
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            try:
+                db = get_db()
+            except Exception:
+                continue
+
+            now = datetime.utcnow()
+            expires_at = now + timedelta(seconds=self.ttl)
+            held = list(self.held)
+            try:
+                # One round trip renews every lease, however many communities this worker owns
+                await db.leases.update_many(
+                    {"_id": {"$in": held}, "owner": self.worker_id},
+                    {"$set": {"expires_at": expires_at}}
+                )
+                owned = {lease["_id"] async for lease in db.leases.find(
+                    {"_id": {"$in": held}, "owner": self.worker_id}, {"_id": 1}
+                )}
+                for name in held:
+                    if name not in owned and name in self.held:
+                        self.held.discard(name)
+                        self.lost += 1
+                        print(f"⚠️  Lost lease {name}")
+                self.renewed_at = now
+            except Exception as e:
+                print(f"Warning: Could not renew leases: {e}")
+                # Past the TTL other workers may already have taken over
+                if (now - self.renewed_at).total_seconds() > self.ttl:
+                    self.lost += len(self.held)
+                    self.held.clear()
+
+            # Keep trying for leadership so it fails over when the leader dies
+            if not self.is_leader:
+                await self.acquire(LEADER_LEASE)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "is_leader": self.is_leader,
+            "held": len(self.held),
+            "acquired": self.acquired,
+            "lost": self.lost,
+            "ttl_seconds": self.ttl
+        }
+
+def community_lease(community_id: str) -> str:
+    return f"community:{community_id}"
+
+def ingest_job_lease(job_id: str) -> str:
+    return f"ingest_job:{job_id}"
+
+# Global instance
+lease_manager = LeaseManager()
@@ -0,0 +1,112 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "our", "so", "that", "the", "this", "to",
+    "was", "we", "what", "when", "where", "which", "who", "why", "with", "you", "your"
+}
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """In-memory inverted index over one community's chunks and memories, scored with BM25.
+
+    Safe to use from several threads (vector store operations run on a thread pool).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Tuple[Counter, int, str, Dict[str, Any]]] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, entry_id: str, text: str, metadata: Dict[str, Any] = None):
+        with self.lock:
+            self._add(entry_id, text, metadata)
+
+    def _add(self, entry_id: str, text: str, metadata: Dict[str, Any] = None):
+        if entry_id in self.entries:
+            self._remove([entry_id])
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        self.entries[entry_id] = (terms, length, text, metadata or {})
+        self.total_length += length
+        for term in terms:
+            self.postings.setdefault(term, set()).add(entry_id)
+
+    def remove(self, entry_ids: Iterable[str]):
+        with self.lock:
+            self._remove(entry_ids)
+
+    def _remove(self, entry_ids: Iterable[str]):
+        for entry_id in entry_ids:
+            entry = self.entries.pop(entry_id, None)
+            if entry is None:
+                continue
+            terms, length, _, _ = entry
+            self.total_length -= length
+            for term in terms:
+                ids = self.postings.get(term)
+                if ids is not None:
+                    ids.discard(entry_id)
+                    if not ids:
+                        del self.postings[term]
+
+    def remove_where(self, key: str, value: Any):
+        with self.lock:
+            self._remove([entry_id for entry_id, entry in self.entries.items() if entry[3].get(key) == value])
+
+    def search(self, query: str, n_results: int) -> List[Dict[str, Any]]:
+        """Top entries for a query, each with its BM25 score and the share of query terms it contains.
+
+        ``normalized_score`` divides the score by the query's total IDF, so 1.0 is roughly every
+        query term appearing once in an average-length entry.
+        """
+        terms = set(tokenize(query))
+        with self.lock:
+            return self._search(terms, n_results)
+
+    def _search(self, terms: Set[str], n_results: int) -> List[Dict[str, Any]]:
+        if not terms or not self.entries:
+            return []
+
+        count = len(self.entries)
+        average_length = self.total_length / count or 1
+        scores: Dict[str, float] = {}
+        matched: Counter = Counter()
+        idf_total = 0.0
+        for term in terms:
+            ids = self.postings.get(term, ())
+            idf = math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            idf_total += idf
+            for entry_id in ids:
+                entry_terms, length, _, _ = self.entries[entry_id]
+                frequency = entry_terms[term]
+                scores[entry_id] = scores.get(entry_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                )
+                matched[entry_id] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+        return [{
+            "id": entry_id,
+            "score": score,
+            "normalized_score": score / idf_total if idf_total else 0.0,
+            "coverage": matched[entry_id] / len(terms),
+            "document": self.entries[entry_id][2],
+            "metadata": self.entries[entry_id][3]
+        } for entry_id, score in ranked]
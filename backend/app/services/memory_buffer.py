@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+
+from app.services.vector_store import add_memories
+
+load_dotenv()
+
+MEMORY_FLUSH_SIZE = int(os.getenv("MEMORY_FLUSH_SIZE", "32"))
+MEMORY_FLUSH_INTERVAL_MS = float(os.getenv("MEMORY_FLUSH_INTERVAL_MS", "500"))
+MEMORY_BUFFER_MAX = int(os.getenv("MEMORY_BUFFER_MAX", "5000"))
+
+class MemoryWriteBuffer:
+    """Write-behind buffer for conversation memories.
+
+    Memories are queued in process and written to Chroma as one batch once MEMORY_FLUSH_SIZE
+    items are waiting or MEMORY_FLUSH_INTERVAL_MS has passed, keeping embedding out of reply latency.
+    """
+
+    def __init__(self, flush_size: int = MEMORY_FLUSH_SIZE, interval_ms: float = MEMORY_FLUSH_INTERVAL_MS):
+        self.flush_size = flush_size
+        self.interval = interval_ms / 1000
+        self.items: List[Dict[str, Any]] = []
+        self.task = None
+        self._wakeup = asyncio.Event()
+
+        self.flushes = 0
+        self.flushed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.total_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+
+    async def start(self):
+        self.task = asyncio.create_task(self._run())
+        print(f"✅ Memory write buffer started (batch {self.flush_size}, every {self.interval * 1000:.0f}ms)")
+
+    async def stop(self):
+        """Stop the flusher and write out everything still buffered"""
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        while self.items:
+            if not await self.flush():
+                break
+
+    def add(self, community_id: str, memory_id: str, text: str, metadata: dict = None):
+        """Queue a memory for the next batched write"""
+        if len(self.items) >= MEMORY_BUFFER_MAX:
+            # Vector store cannot keep up: drop the oldest memory rather than grow without bound
+            self.items.pop(0)
+            self.dropped += 1
+        self.items.append({"community_id": community_id, "memory_id": memory_id, "text": text, "metadata": metadata})
+        if len(self.items) >= self.flush_size:
+            self._wakeup.set()
+
+    async def flush(self) -> bool:
+        batch, self.items = self.items[:self.flush_size], self.items[self.flush_size:]
+        if not batch:
+            return True
+
+        started = time.perf_counter()
+        try:
+            await add_memories(batch)
+        except Exception as e:
+            print(f"Error flushing {len(batch)} memories to vector store: {e}")
+            # Put the batch back for the next interval if there is room, otherwise lose it
+            room = max(MEMORY_BUFFER_MAX - len(self.items), 0)
+            self.failed += len(batch) - min(room, len(batch))
+            self.items = batch[:room] + self.items
+            return False
+
+        elapsed = time.perf_counter() - started
+        self.flushes += 1
+        self.flushed += len(batch)
+        self.last_flush_seconds = elapsed
+        self.total_flush_seconds += elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self.items:
+                if not await self.flush() or len(self.items) < self.flush_size:
+                    break
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self.items),
+            "flush_size": self.flush_size,
+            "flush_interval_ms": self.interval * 1000,
+            "flushes": self.flushes,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_flush_ms": round(self.total_flush_seconds / self.flushes * 1000, 2) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 2),
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2)
+        }
+
+# Global instance
+memory_buffer = MemoryWriteBuffer()
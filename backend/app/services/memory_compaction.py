@@ -0,0 +1,192 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+
+from app.database import get_db
+from app.services.gemini_service import generate_text
+from app.services.answer_cache import answer_cache
+from app.services.leases import lease_manager
+from app.services.vector_store import add_memory, delete_answers_before, delete_memories, get_memories, has_collection
+
+load_dotenv()
+
+# Defaults for communities without their own memoryMaxAgeDays / memoryMaxInteractions
+MEMORY_MAX_AGE_DAYS = int(os.getenv("MEMORY_MAX_AGE_DAYS", "14"))
+MEMORY_MAX_INTERACTIONS = int(os.getenv("MEMORY_MAX_INTERACTIONS", "500"))
+MEMORY_MAX_SUMMARIES = int(os.getenv("MEMORY_MAX_SUMMARIES", "200"))
+# Raw interactions folded into one summary memory
+MEMORY_SUMMARY_BATCH = int(os.getenv("MEMORY_SUMMARY_BATCH", "50"))
+MEMORY_COMPACTION_INTERVAL = float(os.getenv("MEMORY_COMPACTION_INTERVAL", "3600"))
+# Length of each question kept in a summary made without the LLM
+FALLBACK_QUESTION_CHARS = 200
+
+RETENTION_PROJECTION = {"memoryMaxAgeDays": 1, "memoryMaxInteractions": 1, "answerCacheEnabled": 1, "content_updated_at": 1}
+
+def _fallback_summary(batch: List[tuple]) -> str:
+    """Summary built without the LLM: the members' questions, truncated"""
+    questions = []
+    for _, _, text in batch:
+        question = (text or "").split("\n", 1)[0]
+        if question.startswith("User: "):
+            question = question[len("User: "):]
+        if question.strip():
+            questions.append(question.strip()[:FALLBACK_QUESTION_CHARS])
+    return "Members asked: " + "; ".join(questions) if questions else "Earlier conversations (no text kept)"
+
+def _memory_time(memory_id: str, meta: Dict[str, Any]) -> float:
+    """Creation timestamp of a memory (older entries only carry it in the id)"""
+    if meta and "created_at" in meta:
+        return float(meta["created_at"])
+    try:
+        return float(memory_id.rsplit("_", 1)[1])
+    except (IndexError, ValueError):
+        return 0.0
+
+class MemoryCompactor:
+    """Keeps conversation memory bounded by folding old interactions into summaries.
+
+    On the leader, every MEMORY_COMPACTION_INTERVAL seconds each community's interactions that
+    are older than its age limit, or beyond its count limit, are summarised in batches of
+    MEMORY_SUMMARY_BATCH and the raw entries are deleted. Only the newest MEMORY_MAX_SUMMARIES
+    summaries are kept. When the LLM is unavailable the summary lists the members' questions
+    instead, so the limits always apply. Expired entries of the answer cache are removed in the
+    same pass. Communities without a collection (never deployed) are skipped.
+    """
+
+    def __init__(self, interval: float = MEMORY_COMPACTION_INTERVAL):
+        self.interval = interval
+        self.task = None
+
+        self.runs = 0
+        self.compacted = 0
+        self.summaries = 0
+        self.summaries_dropped = 0
+        self.fallback_summaries = 0
+        self.failed = 0
+        self.last_run_seconds = 0.0
+
+    async def start(self):
+        if self.interval > 0:
+            self.task = asyncio.create_task(self._run())
+            print(f"✅ Memory compaction started (every {self.interval:.0f}s)")
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if lease_manager.is_leader:
+                try:
+                    await self.compact_all()
+                except Exception as e:
+                    print(f"Error in memory compaction: {e}")
+
+    async def compact_all(self):
+        started = time.perf_counter()
+        db = get_db()
+        async for community in db.communities.find({}, RETENTION_PROJECTION):
+            try:
+                if not await has_collection(str(community["_id"])):
+                    continue
+                await self.compact(
+                    str(community["_id"]),
+                    community.get("memoryMaxAgeDays") or MEMORY_MAX_AGE_DAYS,
+                    community.get("memoryMaxInteractions") or MEMORY_MAX_INTERACTIONS
+                )
+                if answer_cache.enabled(community):
+                    # Drop cached answers that can no longer be served
+                    await delete_answers_before(str(community["_id"]), answer_cache.valid_after(community))
+            except Exception as e:
+                self.failed += 1
+                print(f"Error compacting memory for community {community['_id']}: {e}")
+        self.runs += 1
+        self.last_run_seconds = time.perf_counter() - started
+
+    async def compact(self, community_id: str, max_age_days: int, max_interactions: int):
+        """Summarise and delete a community's interactions outside its age and count limits"""
+        existing = await get_memories(community_id, "interaction")
+        interactions = sorted(
+            (_memory_time(memory_id, meta), memory_id, text)
+            for memory_id, text, meta in zip(existing["ids"], existing["documents"], existing["metadatas"])
+        )
+
+        cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).timestamp()
+        expired = sum(1 for created_at, _, _ in interactions if created_at < cutoff)
+        # Compact whole batches only, so recent history is not summarised a few entries at a time
+        overflow = len(interactions) - max_interactions
+        if overflow > 0:
+            overflow = -(-overflow // MEMORY_SUMMARY_BATCH) * MEMORY_SUMMARY_BATCH
+        old = interactions[:min(max(expired, overflow), len(interactions))]
+
+        for batch_start in range(0, len(old), MEMORY_SUMMARY_BATCH):
+            batch = old[batch_start:batch_start + MEMORY_SUMMARY_BATCH]
+            await self._summarise(community_id, batch)
+
+        await self._trim_summaries(community_id)
+
+    async def _summarise(self, community_id: str, batch: List[tuple]):
+        period_start, period_end = batch[0][0], batch[-1][0]
+        conversation = "\n\n".join(text for _, _, text in batch)
+        prompt = f"""
+        Summarise the following community conversations in a short paragraph.
+        Keep recurring questions, decisions, facts about the community and the members' main interests.
+        Leave out greetings and small talk.
+
+        {conversation}
+        """
+        try:
+            summary = await generate_text(prompt)
+        except Exception as e:
+            print(f"Warning: Could not summarise memory for community {community_id}, keeping the questions: {e}")
+            summary = _fallback_summary(batch)
+            self.fallback_summaries += 1
+
+        await add_memory(
+            community_id=community_id,
+            memory_id=f"summary_{period_start}_{period_end}",
+            text=summary,
+            metadata={
+                "type": "summary",
+                "created_at": period_end,
+                "period_start": period_start,
+                "period_end": period_end,
+                "interactions": len(batch)
+            }
+        )
+        await delete_memories(community_id, [memory_id for _, memory_id, _ in batch])
+        self.summaries += 1
+        self.compacted += len(batch)
+
+    async def _trim_summaries(self, community_id: str):
+        existing = await get_memories(community_id, "summary")
+        if len(existing["ids"]) <= MEMORY_MAX_SUMMARIES:
+            return
+        summaries = sorted(
+            (_memory_time(memory_id, meta), memory_id)
+            for memory_id, meta in zip(existing["ids"], existing["metadatas"])
+        )
+        dropped = [memory_id for _, memory_id in summaries[:len(summaries) - MEMORY_MAX_SUMMARIES]]
+        await delete_memories(community_id, dropped)
+        self.summaries_dropped += len(dropped)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "interactions_compacted": self.compacted,
+            "summaries_written": self.summaries,
+            "summaries_dropped": self.summaries_dropped,
+            "fallback_summaries": self.fallback_summaries,
+            "failed": self.failed,
+            "last_run_ms": round(self.last_run_seconds * 1000, 2)
+        }
+
+# Global instance
+memory_compactor = MemoryCompactor()
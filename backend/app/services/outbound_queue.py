@@ -0,0 +1,346 @@
+import asyncio
+import itertools
+import os
+import time
+from typing import Any, Dict, List, Set, Tuple
+from pymongo import ReturnDocument
+from dotenv import load_dotenv
+
+from app.database import get_db
+from app.services.http_client import telegram_request
+
+load_dotenv()
+
+# Telegram allows about 30 messages/s per bot, 20 messages/min per group and 1 message/s per private chat
+TELEGRAM_BOT_RATE = float(os.getenv("TELEGRAM_BOT_RATE", "30"))
+TELEGRAM_GROUP_RATE_PER_MINUTE = float(os.getenv("TELEGRAM_GROUP_RATE_PER_MINUTE", "20"))
+TELEGRAM_PRIVATE_CHAT_RATE = float(os.getenv("TELEGRAM_PRIVATE_CHAT_RATE", "1"))
+OUTBOUND_WORKERS = int(os.getenv("OUTBOUND_WORKERS", "8"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "5"))
+OUTBOUND_BACKOFF_BASE = float(os.getenv("OUTBOUND_BACKOFF_BASE", "1"))
+OUTBOUND_BACKOFF_MAX = float(os.getenv("OUTBOUND_BACKOFF_MAX", "60"))
+
+# Lower values are sent first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SCHEDULED = 1
+
+MAX_BUCKETS = 10000
+# Shared buckets (``rate_limits`` collection) unused for this long are removed by a TTL index
+SHARED_BUCKET_TTL_SECONDS = 3600
+
+def chat_limits(chat_id: str) -> Tuple[float, float]:
+    """(tokens per second, capacity) of a chat's bucket"""
+    # Group and channel ids are negative
+    if chat_id.startswith("-"):
+        return TELEGRAM_GROUP_RATE_PER_MINUTE / 60, max(1.0, TELEGRAM_GROUP_RATE_PER_MINUTE / 20)
+    return TELEGRAM_PRIVATE_CHAT_RATE, 1.0
+
+def _bot_id(bot_token: str) -> str:
+    # The part of a bot token before the colon is the bot's public id, so the secret is not stored
+    return bot_token.split(":", 1)[0]
+
+def _take_pipeline(rate: float, capacity: float) -> List[Dict[str, Any]]:
+    """Update pipeline that refills a shared bucket and takes a token if one is available.
+
+    Uses the server clock ($$NOW), so all backend workers agree on elapsed time. Sets ``wait``
+    to 0 when a token was taken, otherwise to the seconds until one is available.
+    """
+    elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+    return [
+        {"$set": {
+            "tokens": {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, rate]}]}]},
+            "paused_until": {"$ifNull": ["$paused_until", "$$NOW"]},
+            "updated_at": "$$NOW",
+            "expires_at": {"$add": ["$$NOW", SHARED_BUCKET_TTL_SECONDS * 1000]}
+        }},
+        {"$set": {"granted": {"$and": [{"$gte": ["$tokens", 1]}, {"$lte": ["$paused_until", "$$NOW"]}]}}},
+        {"$set": {
+            "tokens": {"$cond": ["$granted", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+            "wait": {"$cond": ["$granted", 0, {"$max": [
+                {"$divide": [{"$subtract": [1, "$tokens"]}, rate]},
+                {"$divide": [{"$subtract": ["$paused_until", "$$NOW"]}, 1000]}
+            ]}]}
+        }}
+    ]
+
+class TokenBucket:
+    """Token bucket that can also be paused (e.g. for a 429 retry_after)"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(self.paused_until - now, 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity and self.paused_until <= time.monotonic()
+
+class OutboundQueue:
+    """Priority send queue for Telegram messages, rate limited per bot and per chat.
+
+    The token buckets live in the ``rate_limits`` collection and are updated atomically, so
+    the limits hold across all backend workers together; without a database each process
+    uses its own in-memory buckets. 429 responses pause the affected buckets for the returned
+    ``retry_after``; network and server errors are retried with bounded exponential backoff.
+    Interactive replies are always sent ahead of scheduled posts.
+    """
+
+    def __init__(self, workers: int = OUTBOUND_WORKERS):
+        self.workers = workers
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.bot_buckets: Dict[str, TokenBucket] = {}
+        self.chat_buckets: Dict[str, TokenBucket] = {}
+        self.worker_tasks: List[asyncio.Task] = []
+        self.direct_tasks: Set[asyncio.Task] = set()
+        self._sequence = itertools.count()
+        self.delayed = 0
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.rate_limited = 0
+        self.shared_errors = 0
+
+    async def start(self):
+        try:
+            db = get_db()
+            await db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            print(f"⚠️  Rate limit index not created: {e}")
+        for _ in range(self.workers):
+            self.worker_tasks.append(asyncio.create_task(self._worker()))
+        print(f"✅ Outbound Telegram queue started ({self.workers} workers)")
+
+    async def stop(self):
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+
+    async def send(self, bot_token: str, chat_id: str, text: str, priority: int = PRIORITY_INTERACTIVE) -> bool:
+        """Queue a message and wait until it is delivered or given up on"""
+        return await self.enqueue(bot_token, chat_id, text, priority)
+
+    def enqueue(self, bot_token: str, chat_id: str, text: str, priority: int = PRIORITY_INTERACTIVE) -> asyncio.Future:
+        """Queue a message without waiting for it; the returned future resolves to whether it was delivered"""
+        if not self.worker_tasks:
+            # Queue not running (e.g. outside the app lifespan): send directly
+            task = asyncio.create_task(self._send_direct(bot_token, chat_id, text))
+            self.direct_tasks.add(task)
+            task.add_done_callback(self.direct_tasks.discard)
+            return task
+
+        item = {
+            "bot_token": bot_token,
+            "chat_id": str(chat_id),
+            "text": text,
+            "priority": priority,
+            "attempts": 0,
+            "future": asyncio.get_running_loop().create_future()
+        }
+        self._put(item)
+        return item["future"]
+
+    async def _send_direct(self, bot_token: str, chat_id: str, text: str) -> bool:
+        try:
+            response = await telegram_request(bot_token, "sendMessage", json={"chat_id": chat_id, "text": text})
+        except Exception as e:
+            print(f"Error sending Telegram message: {e}")
+            return False
+        return response.status_code == 200
+
+    def _put(self, item: Dict[str, Any]):
+        self.queue.put_nowait((item["priority"], next(self._sequence), item))
+
+    def _put_later(self, item: Dict[str, Any], delay: float):
+        self.delayed += 1
+
+        def requeue():
+            self.delayed -= 1
+            self._put(item)
+
+        asyncio.get_running_loop().call_later(delay, requeue)
+
+    def _bot_bucket(self, bot_token: str) -> TokenBucket:
+        bucket = self.bot_buckets.get(bot_token)
+        if bucket is None:
+            self._prune(self.bot_buckets)
+            bucket = self.bot_buckets[bot_token] = TokenBucket(TELEGRAM_BOT_RATE, TELEGRAM_BOT_RATE)
+        return bucket
+
+    def _chat_bucket(self, bot_token: str, chat_id: str) -> TokenBucket:
+        key = f"{bot_token}:{chat_id}"
+        bucket = self.chat_buckets.get(key)
+        if bucket is None:
+            self._prune(self.chat_buckets)
+            bucket = self.chat_buckets[key] = TokenBucket(*chat_limits(chat_id))
+        return bucket
+
+    @staticmethod
+    def _prune(buckets: Dict[str, TokenBucket]):
+        if len(buckets) >= MAX_BUCKETS:
+            for key in [key for key, bucket in buckets.items() if bucket.idle]:
+                del buckets[key]
+
+    async def _worker(self):
+        while True:
+            _, _, item = await self.queue.get()
+            try:
+                await self._process(item)
+            except Exception as e:
+                print(f"Error in outbound queue worker: {e}")
+                if not item["future"].done():
+                    item["future"].set_result(False)
+            finally:
+                self.queue.task_done()
+
+    async def _reserve(self, item: Dict[str, Any]) -> float:
+        """Take a token from the bot's and the chat's bucket, or return the seconds to wait (nothing taken)"""
+        try:
+            db = get_db()
+        except Exception:
+            db = None
+        if db is not None:
+            try:
+                return await self._reserve_shared(db, item)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"Warning: Shared rate limits unavailable, using this worker's buckets: {e}")
+
+        bot_bucket = self._bot_bucket(item["bot_token"])
+        chat_bucket = self._chat_bucket(item["bot_token"], item["chat_id"])
+        wait = max(bot_bucket.delay(), chat_bucket.delay())
+        if wait <= 0:
+            bot_bucket.take()
+            chat_bucket.take()
+        return wait
+
+    async def _reserve_shared(self, db, item: Dict[str, Any]) -> float:
+        bot_id = _bot_id(item["bot_token"])
+        chat_key = f"chat:{bot_id}:{item['chat_id']}"
+        chat = await db.rate_limits.find_one_and_update(
+            {"_id": chat_key}, _take_pipeline(*chat_limits(item["chat_id"])),
+            upsert=True, return_document=ReturnDocument.AFTER, projection={"wait": 1}
+        )
+        if chat["wait"] > 0:
+            return chat["wait"]
+
+        bot = await db.rate_limits.find_one_and_update(
+            {"_id": f"bot:{bot_id}"}, _take_pipeline(TELEGRAM_BOT_RATE, TELEGRAM_BOT_RATE),
+            upsert=True, return_document=ReturnDocument.AFTER, projection={"wait": 1}
+        )
+        if bot["wait"] > 0:
+            # Return the chat's token, since nothing is sent
+            await db.rate_limits.update_one({"_id": chat_key}, {"$inc": {"tokens": 1}})
+            return bot["wait"]
+        return 0.0
+
+    async def _pause(self, item: Dict[str, Any], seconds: float):
+        """Hold back both the chat and the bot (Telegram does not say which limit was hit)"""
+        self._chat_bucket(item["bot_token"], item["chat_id"]).pause(seconds)
+        self._bot_bucket(item["bot_token"]).pause(seconds)
+        try:
+            db = get_db()
+            bot_id = _bot_id(item["bot_token"])
+            until = {"$add": ["$$NOW", seconds * 1000]}
+            await db.rate_limits.update_many(
+                {"_id": {"$in": [f"chat:{bot_id}:{item['chat_id']}", f"bot:{bot_id}"]}},
+                [{"$set": {"paused_until": {"$max": [{"$ifNull": ["$paused_until", until]}, until]}}}]
+            )
+        except Exception:
+            pass
+
+    async def _process(self, item: Dict[str, Any]):
+        # Not allowed to send yet: park the message instead of blocking this worker
+        wait = await self._reserve(item)
+        if wait > 0:
+            self._put_later(item, wait)
+            return
+
+        item["attempts"] += 1
+
+        try:
+            response = await telegram_request(
+                item["bot_token"],
+                "sendMessage",
+                json={"chat_id": item["chat_id"], "text": item["text"]}
+            )
+        except Exception as e:
+            print(f"Error sending Telegram message: {e}")
+            self._retry(item, self._backoff(item))
+            return
+
+        if response.status_code == 200:
+            self.sent += 1
+            item["future"].set_result(True)
+        elif response.status_code == 429:
+            self.rate_limited += 1
+            retry_after = self._retry_after(response)
+            await self._pause(item, retry_after)
+            self._retry(item, retry_after)
+        elif response.status_code >= 500:
+            self._retry(item, self._backoff(item))
+        else:
+            print(f"Telegram rejected message to chat {item['chat_id']}: {response.status_code} {response.text[:200]}")
+            self.failed += 1
+            item["future"].set_result(False)
+
+    def _retry(self, item: Dict[str, Any], delay: float):
+        if item["attempts"] > OUTBOUND_MAX_RETRIES:
+            print(f"Giving up on message to chat {item['chat_id']} after {item['attempts']} attempts")
+            self.failed += 1
+            item["future"].set_result(False)
+            return
+        self.retried += 1
+        self._put_later(item, delay)
+
+    @staticmethod
+    def _backoff(item: Dict[str, Any]) -> float:
+        return min(OUTBOUND_BACKOFF_BASE * 2 ** (item["attempts"] - 1), OUTBOUND_BACKOFF_MAX)
+
+    @staticmethod
+    def _retry_after(response) -> float:
+        try:
+            return float(response.json()["parameters"]["retry_after"])
+        except Exception:
+            return float(response.headers.get("Retry-After", OUTBOUND_BACKOFF_BASE))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.queue.qsize(),
+            "delayed": self.delayed,
+            "workers": len(self.worker_tasks),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rate_limited": self.rate_limited,
+            "shared_errors": self.shared_errors,
+            "bot_buckets": len(self.bot_buckets),
+            "chat_buckets": len(self.chat_buckets)
+        }
+
+# Global instance
+outbound_queue = OutboundQueue()
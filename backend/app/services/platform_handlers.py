@@ -1,8 +1,10 @@
-import httpx
 from typing import Dict, Any
 import os
 from dotenv import load_dotenv
 
+from app.services.http_client import telegram_request
+from app.services.outbound_queue import outbound_queue, PRIORITY_INTERACTIVE
+
 load_dotenv()
 
 BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
@@ -11,27 +13,35 @@ async def setup_telegram_webhook(bot_token: str, community_id: str) -> bool:
     """Setup Telegram webhook"""
     webhook_url = f"{BASE_URL}/api/webhooks/telegram/{community_id}"
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"https://api.telegram.org/bot{bot_token}/setWebhook",
-                params={"url": webhook_url}
-            )
-            return response.status_code == 200
-        except Exception as e:
-            print(f"Error setting up Telegram webhook: {e}")
-            return False
+    try:
+        response = await telegram_request(bot_token, "setWebhook", params={"url": webhook_url})
+        return response.status_code == 200
+    except Exception as e:
+        print(f"Error setting up Telegram webhook: {e}")
+        return False
+
+async def send_telegram_message(
+    bot_token: str,
+    chat_id: str,
+    message: str,
+    priority: int = PRIORITY_INTERACTIVE
+) -> bool:
+    """Send message via Telegram (rate limited and retried by the outbound queue)"""
+    try:
+        return await outbound_queue.send(bot_token, chat_id, message, priority=priority)
+    except Exception as e:
+        print(f"Error sending Telegram message: {e}")
+        return False
 
-async def send_telegram_message(bot_token: str, chat_id: str, message: str) -> bool:
-    """Send message via Telegram"""
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"https://api.telegram.org/bot{bot_token}/sendMessage",
-                json={"chat_id": chat_id, "text": message}
-            )
-            return response.status_code == 200
-        except Exception as e:
-            print(f"Error sending Telegram message: {e}")
-            return False
 
+def queue_telegram_message(
+    bot_token: str,
+    chat_id: str,
+    message: str,
+    priority: int = PRIORITY_INTERACTIVE
+):
+    """Queue a message via Telegram without waiting for delivery (rate limits can delay it for seconds)"""
+    try:
+        outbound_queue.enqueue(bot_token, chat_id, message, priority=priority)
+    except Exception as e:
+        print(f"Error queueing Telegram message: {e}")
@@ -0,0 +1,148 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from dotenv import load_dotenv
+
+from app.database import get_db
+from app.services.leases import lease_manager, community_lease
+from app.services.post_scheduler import post_scheduler
+
+load_dotenv()
+
+POST_DRAFT_BUFFER = int(os.getenv("POST_DRAFT_BUFFER", "2"))
+# Drafts are generated once a community's next post is this close
+POST_DRAFT_LEAD_HOURS = float(os.getenv("POST_DRAFT_LEAD_HOURS", "6"))
+POST_DRAFT_MAX_AGE_HOURS = float(os.getenv("POST_DRAFT_MAX_AGE_HOURS", "48"))
+POST_DRAFT_CHECK_INTERVAL = float(os.getenv("POST_DRAFT_CHECK_INTERVAL", "300"))
+
+# Community fields needed to generate a post, without history arrays
+DRAFT_COMMUNITY_PROJECTION = {"purpose": 1, "engagementStyle": 1, "moderationLevel": 1, "platform": 1}
+
+GenerateCallback = Callable[[Dict[str, Any]], Awaitable[str]]
+
+class PostDraftBuffer:
+    """Look-ahead buffer of pre-generated scheduled posts stored in the ``post_drafts`` collection.
+
+    A background loop keeps up to POST_DRAFT_BUFFER ready drafts for every community whose next
+    run is within POST_DRAFT_LEAD_HOURS, so a due post only has to be sent.
+    """
+
+    def __init__(self, depth: int = POST_DRAFT_BUFFER):
+        self.depth = depth
+        self.generate: Optional[GenerateCallback] = None
+        self.schedules: Optional[Callable[[], List[Dict[str, Any]]]] = None
+        self.task = None
+
+        self.generated = 0
+        self.served = 0
+        self.misses = 0
+        self.failed = 0
+
+    async def start(self, generate: GenerateCallback, schedules: Callable[[], List[Dict[str, Any]]]):
+        """``schedules`` returns the current schedule entries (with ``_id`` and ``next_run_at``)"""
+        self.generate = generate
+        self.schedules = schedules
+        if self.depth > 0:
+            self.task = asyncio.create_task(self._run())
+            print(f"✅ Post draft buffer started (depth {self.depth}, lead {POST_DRAFT_LEAD_HOURS}h)")
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def take(self, community_id: str) -> Optional[str]:
+        """Claim the oldest ready draft for a community, or None if the buffer is empty"""
+        try:
+            db = get_db()
+            draft = await db.post_drafts.find_one_and_update(
+                {
+                    "communityId": community_id,
+                    "status": "ready",
+                    "created_at": {"$gte": datetime.utcnow() - timedelta(hours=POST_DRAFT_MAX_AGE_HOURS)}
+                },
+                {"$set": {"status": "used", "used_at": datetime.utcnow()}},
+                sort=[("created_at", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            print(f"Warning: Could not read post drafts for community {community_id}: {e}")
+            draft = None
+
+        if draft is None:
+            self.misses += 1
+            return None
+        self.served += 1
+        return draft["content"]
+
+    async def discard(self, community_id: str):
+        """Drop ready drafts, e.g. after the community's style or purpose changed"""
+        try:
+            db = get_db()
+            await db.post_drafts.delete_many({"communityId": community_id, "status": "ready"})
+        except Exception as e:
+            print(f"Warning: Could not discard post drafts for community {community_id}: {e}")
+
+    async def refill(self, community_id: str):
+        """Generate drafts until the community has ``depth`` fresh ready drafts"""
+        db = get_db()
+        fresh_after = datetime.utcnow() - timedelta(hours=POST_DRAFT_MAX_AGE_HOURS)
+        ready = await db.post_drafts.count_documents({
+            "communityId": community_id,
+            "status": "ready",
+            "created_at": {"$gte": fresh_after}
+        })
+        if ready >= self.depth:
+            return
+
+        community = await db.communities.find_one({"_id": ObjectId(community_id)}, DRAFT_COMMUNITY_PROJECTION)
+        if not community:
+            return
+
+        for _ in range(self.depth - ready):
+            # Drafts share the scheduler's per-minute generation cap
+            await post_scheduler.acquire_generation()
+            content = await self.generate(community)
+            await db.post_drafts.insert_one({
+                "communityId": community_id,
+                "content": content,
+                "status": "ready",
+                "created_at": datetime.utcnow()
+            })
+            self.generated += 1
+
+    async def _run(self):
+        while True:
+            try:
+                horizon = datetime.utcnow() + timedelta(hours=POST_DRAFT_LEAD_HOURS)
+                for schedule in list(self.schedules()):
+                    if schedule["next_run_at"] > horizon:
+                        continue
+                    # Drafts are made by the worker that will post them
+                    if not await lease_manager.acquire(community_lease(schedule["_id"])):
+                        continue
+                    try:
+                        await self.refill(schedule["_id"])
+                    except Exception as e:
+                        self.failed += 1
+                        print(f"Error generating post drafts for community {schedule['_id']}: {e}")
+            except Exception as e:
+                print(f"Error in post draft loop: {e}")
+            await asyncio.sleep(POST_DRAFT_CHECK_INTERVAL)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "lead_hours": POST_DRAFT_LEAD_HOURS,
+            "generated": self.generated,
+            "served": self.served,
+            "misses": self.misses,
+            "failed": self.failed
+        }
+
+# Global instance
+post_drafts = PostDraftBuffer()
@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import heapq
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.database import get_db
+from app.services.leases import lease_manager, community_lease
+from app.services.outbound_queue import TokenBucket
+
+load_dotenv()
+
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+# Upper bound on how long the loop sleeps, so schedules changed by other processes are noticed
+SCHEDULER_MAX_SLEEP = float(os.getenv("SCHEDULER_MAX_SLEEP", "60"))
+# Random delay added to each run on top of the community's fixed slot in the interval
+SCHEDULER_JITTER_SECONDS = float(os.getenv("SCHEDULER_JITTER_SECONDS", "300"))
+SCHEDULER_MAX_POSTS_PER_MINUTE = float(os.getenv("SCHEDULER_MAX_POSTS_PER_MINUTE", "30"))
+
+FREQUENCY_INTERVAL_HOURS = {
+    "low": 24,       # once per day
+    "moderate": 12,  # twice per day
+    "high": 6        # four times per day
+}
+
+PostCallback = Callable[[str], Awaitable[bool]]
+
+def get_interval_hours(frequency: str) -> float:
+    """Posting interval for a community's postingFrequency setting"""
+    return FREQUENCY_INTERVAL_HOURS.get(frequency, 12)
+
+def next_slot(community_id: str, interval_hours: float, after: datetime) -> datetime:
+    """Next run time for a community after ``after``.
+
+    Each community gets a fixed offset within its interval derived from its id, so communities
+    deployed together are spread evenly across the window instead of posting at the same moment.
+    """
+    interval = interval_hours * 3600
+    offset = int(hashlib.sha1(community_id.encode()).hexdigest(), 16) % max(int(interval), 1)
+    elapsed = after.timestamp() - offset
+    slot = offset + (elapsed // interval + 1) * interval
+    return datetime.fromtimestamp(slot) + timedelta(seconds=random.uniform(0, SCHEDULER_JITTER_SECONDS))
+
+class PostScheduler:
+    """Single loop that fires scheduled community posts.
+
+    Next-run times are kept in a min-heap and persisted to the ``schedules`` collection. Due
+    posts are handed to a bounded worker pool. Schedules missed while the process was down
+    fire once on startup and then continue at their normal interval. With several backend
+    workers, each community's posts are made by the worker holding its lease. Run times are
+    spread across each interval (see ``next_slot``) and generation is capped per minute.
+    """
+
+    def __init__(self, workers: int = SCHEDULER_WORKERS):
+        self.workers = workers
+        self.schedules: Dict[str, Dict[str, Any]] = {}
+        self.heap: List[Tuple[datetime, str]] = []
+        self.due: asyncio.Queue = asyncio.Queue()
+        self.post_callback: Optional[PostCallback] = None
+        self.tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        # Caps how many posts and drafts are generated per minute, e.g. when catching up after a restart
+        self.generation_bucket = TokenBucket(
+            SCHEDULER_MAX_POSTS_PER_MINUTE / 60,
+            max(1.0, SCHEDULER_MAX_POSTS_PER_MINUTE / 6)
+        )
+
+        self.dispatched = 0
+        self.posted = 0
+        self.failed = 0
+
+    async def start(self, post_callback: PostCallback):
+        self.post_callback = post_callback
+        if await self._load():
+            now = datetime.utcnow()
+            missed = sum(1 for schedule in self.schedules.values() if schedule["next_run_at"] <= now)
+            if missed:
+                print(f"Catching up on {missed} scheduled posts missed while offline")
+        self.tasks.append(asyncio.create_task(self._run()))
+        for _ in range(self.workers):
+            self.tasks.append(asyncio.create_task(self._worker()))
+        print(f"✅ Post scheduler started ({len(self.schedules)} schedules, {self.workers} workers)")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def schedule(self, community_id: str, interval_hours: float):
+        """Create or update a community's schedule. An unchanged interval keeps the pending run time."""
+        now = datetime.utcnow()
+        current = self.schedules.get(community_id)
+        if current and current["interval_hours"] == interval_hours:
+            return
+
+        schedule = {
+            "_id": community_id,
+            "interval_hours": interval_hours,
+            "next_run_at": next_slot(community_id, interval_hours, now),
+            "last_run_at": current["last_run_at"] if current else None,
+            "enabled": True
+        }
+        self.schedules[community_id] = schedule
+        heapq.heappush(self.heap, (schedule["next_run_at"], community_id))
+        await self._persist(schedule)
+        self._wakeup.set()
+
+    async def unschedule(self, community_id: str):
+        schedule = self.schedules.pop(community_id, None)
+        if schedule:
+            schedule["enabled"] = False
+            await self._persist(schedule)
+        await lease_manager.release(community_lease(community_id))
+        # Any heap entry for the community is skipped lazily when it comes due
+
+    async def _load(self) -> bool:
+        """Replace the in-memory schedules with the persisted ones (picks up other workers' changes)"""
+        try:
+            db = get_db()
+            schedules = await db.schedules.find({"enabled": True}).to_list(length=None)
+        except Exception as e:
+            if not self.schedules:
+                print(f"⚠️  Could not load post schedules: {e}")
+            return False
+
+        self.schedules = {schedule["_id"]: schedule for schedule in schedules}
+        self.heap = [(schedule["next_run_at"], schedule["_id"]) for schedule in schedules]
+        heapq.heapify(self.heap)
+        return True
+
+    async def _run(self):
+        synced_at = datetime.utcnow()
+        while True:
+            now = datetime.utcnow()
+            if (now - synced_at).total_seconds() >= SCHEDULER_MAX_SLEEP:
+                await self._load()
+                synced_at = now
+
+            while self.heap and self.heap[0][0] <= now:
+                run_at, community_id = heapq.heappop(self.heap)
+                schedule = self.schedules.get(community_id)
+                # Stale heap entry (unscheduled or rescheduled since it was pushed)
+                if not schedule or schedule["next_run_at"] != run_at:
+                    continue
+                await self._dispatch(schedule, now)
+
+            timeout = SCHEDULER_MAX_SLEEP
+            if self.heap:
+                timeout = min(timeout, max((self.heap[0][0] - datetime.utcnow()).total_seconds(), 0))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch(self, schedule: Dict[str, Any], now: datetime):
+        community_id = schedule["_id"]
+        next_run_at = next_slot(community_id, schedule["interval_hours"], now)
+        
+        # Only the worker holding the community's lease posts for it
+        if not await lease_manager.acquire(community_lease(community_id)):
+            await self._refresh(community_id)
+            return
+        
+        # Advance before posting so a slow or failed post never fires twice. The conditional
+        # update also stops a post that another worker claimed just before a lease handover.
+        if not await self._claim(schedule, now, next_run_at):
+            await self._refresh(community_id)
+            return
+        
+        schedule["last_run_at"] = now
+        schedule["next_run_at"] = next_run_at
+        heapq.heappush(self.heap, (next_run_at, community_id))
+        self.dispatched += 1
+        self.due.put_nowait(community_id)
+
+    async def _claim(self, schedule: Dict[str, Any], now: datetime, next_run_at: datetime) -> bool:
+        try:
+            db = get_db()
+        except Exception:
+            return True
+        
+        try:
+            result = await db.schedules.update_one(
+                {"_id": schedule["_id"], "enabled": True, "next_run_at": {"$lte": now}},
+                {"$set": {"next_run_at": next_run_at, "last_run_at": now, "owner": lease_manager.worker_id}}
+            )
+            return result.modified_count == 1
+        except Exception as e:
+            print(f"Warning: Could not claim scheduled post for community {schedule['_id']}: {e}")
+            return False
+
+    async def _refresh(self, community_id: str):
+        """Reload one schedule after another worker ran it, falling back to retrying after the lease TTL"""
+        try:
+            db = get_db()
+            schedule = await db.schedules.find_one({"_id": community_id, "enabled": True})
+        except Exception:
+            schedule = self.schedules.get(community_id)
+        
+        if schedule is None:
+            self.schedules.pop(community_id, None)
+            return
+        
+        if schedule["next_run_at"] <= datetime.utcnow():
+            # Still due but owned elsewhere: look again once the owner's lease could have expired
+            schedule["next_run_at"] = datetime.utcnow() + timedelta(seconds=lease_manager.ttl)
+        self.schedules[community_id] = schedule
+        heapq.heappush(self.heap, (schedule["next_run_at"], community_id))
+
+    async def _worker(self):
+        while True:
+            community_id = await self.due.get()
+            try:
+                if await self.post_callback(community_id):
+                    self.posted += 1
+                else:
+                    self.failed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Error posting scheduled content for community {community_id}: {e}")
+            finally:
+                self.due.task_done()
+
+    async def acquire_generation(self):
+        """Wait for a slot under SCHEDULER_MAX_POSTS_PER_MINUTE before generating a post or draft"""
+        wait = self.generation_bucket.delay()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.generation_bucket.delay()
+        self.generation_bucket.take()
+
+    async def _persist(self, schedule: Dict[str, Any]):
+        try:
+            db = get_db()
+            await db.schedules.replace_one({"_id": schedule["_id"]}, schedule, upsert=True)
+        except Exception as e:
+            print(f"Warning: Could not persist schedule for community {schedule['_id']}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "schedules": len(self.schedules),
+            "next_run_at": self.heap[0][0] if self.heap else None,
+            "due_queue": self.due.qsize(),
+            "workers": self.workers,
+            "dispatched": self.dispatched,
+            "posted": self.posted,
+            "failed": self.failed
+        }
+
+# Global instance
+post_scheduler = PostScheduler()
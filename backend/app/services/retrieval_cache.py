@@ -0,0 +1,113 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "300"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "5000"))
+RETRIEVAL_CACHE_PER_COMMUNITY = int(os.getenv("RETRIEVAL_CACHE_PER_COMMUNITY", "200"))
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+class RetrievalCache:
+    """In-process TTL/LRU cache of search results, per community.
+
+    Every write to a community's collection bumps its generation and drops its entries, and
+    results computed under an older generation are not stored, so a search never returns results
+    from before a write made by this process. Interaction memory writes are the exception (see
+    vector_store.add_memories). The TTL bounds staleness for those and for writes made by other
+    processes.
+    """
+
+    def __init__(self, ttl: float = RETRIEVAL_CACHE_TTL, max_size: int = RETRIEVAL_CACHE_SIZE, per_community: int = RETRIEVAL_CACHE_PER_COMMUNITY):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.per_community = per_community
+        # community id -> (query key -> (expires at, results)), both in LRU order
+        self.communities: "OrderedDict[str, OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]]" = OrderedDict()
+        self.generations: Dict[str, int] = {}
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+
+    def generation(self, community_id: str) -> int:
+        return self.generations.get(community_id, 0)
+
+    def get(self, community_id: str, query: str, n_results: int, mode: str) -> Optional[Dict[str, Any]]:
+        entries = self.communities.get(community_id)
+        key = (normalize_query(query), n_results, mode)
+        entry = entries.get(key) if entries else None
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del entries[key]
+                self.size -= 1
+                if not entries:
+                    del self.communities[community_id]
+            self.misses += 1
+            return None
+
+        entries.move_to_end(key)
+        self.communities.move_to_end(community_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, community_id: str, generation: int, query: str, n_results: int, mode: str, results: Dict[str, Any]):
+        """Store results computed under ``generation`` (ignored if the community was written since)"""
+        if self.max_size <= 0 or self.per_community <= 0:
+            return
+        if generation != self.generation(community_id):
+            self.stale_writes += 1
+            return
+
+        entries = self.communities.get(community_id)
+        if entries is None:
+            entries = self.communities[community_id] = OrderedDict()
+        key = (normalize_query(query), n_results, mode)
+        if key not in entries:
+            self.size += 1
+        entries[key] = (time.monotonic() + self.ttl, results)
+        entries.move_to_end(key)
+        self.communities.move_to_end(community_id)
+
+        if len(entries) > self.per_community:
+            entries.popitem(last=False)
+            self.size -= 1
+        while self.size > self.max_size:
+            oldest_id, oldest = next(iter(self.communities.items()))
+            oldest.popitem(last=False)
+            self.size -= 1
+            if not oldest:
+                del self.communities[oldest_id]
+
+    def invalidate(self, community_id: str):
+        """Start a new generation after a write to the community's collection"""
+        self.generations[community_id] = self.generation(community_id) + 1
+        entries = self.communities.pop(community_id, None)
+        if entries:
+            self.size -= len(entries)
+        self.invalidations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": self.size,
+            "max_size": self.max_size,
+            "per_community": self.per_community,
+            "communities": len(self.communities),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "stale_writes": self.stale_writes
+        }
+
+# Global instance
+retrieval_cache = RetrievalCache()
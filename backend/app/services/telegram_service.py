@@ -1,41 +1,34 @@
-import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, Any, List
-import httpx
-from app.services.gemini_service import generate_response
-from app.services.vector_store import get_collection
-from app.database import get_db
+from app.services.gemini_service import generate_text
+from app.services.vector_store import search
+from app.services.platform_handlers import send_telegram_message
+from app.services.outbound_queue import PRIORITY_SCHEDULED
+from app.services.post_scheduler import post_scheduler, get_interval_hours
+from app.services.post_drafts import post_drafts
+from app.database import get_db, COMMUNITY_PROJECTION
 from bson import ObjectId
 
 class TelegramService:
-    def __init__(self):
-        self.scheduled_tasks = {}
-    
     async def send_message(self, telegram_token: str, chat_id: str, message: str) -> bool:
-        """Send a message via Telegram"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"https://api.telegram.org/bot{telegram_token}/sendMessage",
-                    json={"chat_id": chat_id, "text": message}
-                )
-                return response.status_code == 200
-            except Exception as e:
-                print(f"Error sending Telegram message: {e}")
-                return False
+        """Send a message via Telegram (queued behind interactive replies)"""
+        return await send_telegram_message(telegram_token, chat_id, message, priority=PRIORITY_SCHEDULED)
     
-    async def generate_content(self, community: Dict[str, Any]) -> str:
-        """Generate content based on community configuration"""
-        # Get relevant documents from vector store
-        collection = get_collection(str(community["_id"]))
-        if collection:
+    async def generate_content(self, community: Dict[str, Any], fallback: bool = True) -> str:
+        """Generate content based on community configuration.
+
+        With ``fallback=False`` generation errors are raised instead of returning a canned post.
+        """
+        # Get relevant documents from the community's collection
+        context = ""
+        try:
             # Query for relevant content based on purpose and rules
             query = f"Generate engaging content for a community about: {community.get('purpose', '')}"
-            results = collection.query(query_texts=[query], n_results=5)
-            
-            context = "\n".join(results['documents'][0]) if results['documents'] else ""
-        else:
-            context = ""
+            results = await search(str(community["_id"]), query, n_results=5)
+            if results["documents"]:
+                context = "\n".join(results["documents"][0])
+        except Exception as e:
+            print(f"Warning: Could not load document context for community {community['_id']}: {e}")
         
         # Generate response using Gemini
         prompt = f"""
@@ -50,7 +43,13 @@ class TelegramService:
         Create a natural, engaging message that would fit this community's style.
         """
         
-        content = await generate_response(prompt)
+        try:
+            content = await generate_text(prompt)
+        except Exception as e:
+            if not fallback:
+                raise
+            print(f"Error generating post content: {e}")
+            content = "Hello everyone! Hope you're having a great day. Let's keep the conversation going! 🚀"
         return content
     
     async def post_immediately(self, community_id: str) -> bool:
@@ -59,11 +58,18 @@ class TelegramService:
         if not db:
             return False
         
-        community = await db.communities.find_one({"_id": ObjectId(community_id)})
+        community = await db.communities.find_one({"_id": ObjectId(community_id)}, COMMUNITY_PROJECTION)
         if not community:
             return False
         
-        content = await self.generate_content(community)
+        # Prefer a pre-generated draft; only generate at posting time if the buffer is empty
+        content = await post_drafts.take(community_id)
+        post_type = "draft"
+        if content is None:
+            # Drafts were already counted against the generation cap when they were made
+            await post_scheduler.acquire_generation()
+            content = await self.generate_content(community)
+            post_type = "immediate"
         success = await self.send_message(
             community["telegram_token"],
             community["telegram_chat_id"],
@@ -72,14 +78,12 @@ class TelegramService:
         
         if success:
             # Log the post
-            await db.communities.update_one(
-                {"_id": ObjectId(community_id)},
-                {"$push": {"scheduledPosts": {
-                    "content": content,
-                    "timestamp": datetime.utcnow(),
-                    "type": "immediate"
-                }}}
-            )
+            await db.posts.insert_one({
+                "communityId": community_id,
+                "content": content,
+                "timestamp": datetime.utcnow(),
+                "type": post_type
+            })
         
         return success
     
@@ -89,34 +93,16 @@ class TelegramService:
         if not db:
             return
         
-        community = await db.communities.find_one({"_id": ObjectId(community_id)})
+        community = await db.communities.find_one({"_id": ObjectId(community_id)}, {"postingFrequency": 1})
         if not community:
             return
         
-        frequency = community.get("postingFrequency", "moderate")
-        
-        # Calculate interval based on frequency
-        if frequency == "low":
-            interval_hours = 24  # once per day
-        elif frequency == "moderate":
-            interval_hours = 12  # twice per day
-        elif frequency == "high":
-            interval_hours = 6   # four times per day
-        else:
-            interval_hours = 12
-        
-        # Cancel existing task if any
-        if community_id in self.scheduled_tasks:
-            self.scheduled_tasks[community_id].cancel()
-        
-        # Schedule new task
-        async def scheduled_post():
-            while True:
-                await asyncio.sleep(interval_hours * 3600)  # Convert hours to seconds
-                await self.post_immediately(community_id)
-        
-        task = asyncio.create_task(scheduled_post())
-        self.scheduled_tasks[community_id] = task
+        interval_hours = get_interval_hours(community.get("postingFrequency", "moderate"))
+        await post_scheduler.schedule(community_id, interval_hours)
+    
+    async def generate_draft(self, community: Dict[str, Any]) -> str:
+        """Generate a post for the draft buffer (errors are raised so no canned post is stored)"""
+        return await self.generate_content(community, fallback=False)
     
     async def start_scheduling(self, community_id: str):
         """Start scheduling for a community"""
@@ -124,9 +110,8 @@ class TelegramService:
     
     async def stop_scheduling(self, community_id: str):
         """Stop scheduling for a community"""
-        if community_id in self.scheduled_tasks:
-            self.scheduled_tasks[community_id].cancel()
-            del self.scheduled_tasks[community_id]
+        await post_scheduler.unschedule(community_id)
+        await post_drafts.discard(community_id)
 
 # Global instance
 telegram_service = TelegramService()
\ No newline at end of file
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+# Seconds to finish already-acknowledged updates on shutdown before the rest are dropped
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "10"))
+
+UpdateHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+class UpdateQueue:
+    """Bounded queue of incoming platform updates drained by a pool of worker tasks"""
+
+    def __init__(self, maxsize: int = WEBHOOK_QUEUE_SIZE, workers: int = WEBHOOK_WORKERS):
+        self.maxsize = maxsize
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.handler: Optional[UpdateHandler] = None
+        self.worker_tasks: List[asyncio.Task] = []
+
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def start(self, handler: UpdateHandler):
+        """Start the worker pool"""
+        self.handler = handler
+        for i in range(self.workers):
+            self.worker_tasks.append(asyncio.create_task(self._worker(i)))
+        print(f"✅ Webhook queue started ({self.workers} workers, max {self.maxsize} updates)")
+
+    async def stop(self, drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        """Process queued updates (Telegram was already told they were received), then cancel the worker pool.
+
+        Updates still queued after ``drain_timeout`` seconds are discarded.
+        """
+        if self.worker_tasks and drain_timeout > 0:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️  Webhook queue not drained within {drain_timeout}s, dropping {self.queue.qsize()} updates")
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+
+    def enqueue(self, community_id: str, update: Dict[str, Any]) -> bool:
+        """Queue an update without waiting. Returns False if the queue is full and it was dropped."""
+        try:
+            self.queue.put_nowait((community_id, update, time.monotonic()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"⚠️  Webhook queue full, dropping update for community {community_id}")
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _worker(self, worker_id: int):
+        while True:
+            community_id, update, queued_at = await self.queue.get()
+            wait = time.monotonic() - queued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            try:
+                await self.handler(community_id, update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Error processing update for community {community_id} (worker {worker_id}): {e}")
+            finally:
+                self.queue.task_done()
+
+    def get_stats(self) -> Dict[str, Any]:
+        dequeued = self.processed + self.failed
+        return {
+            "depth": self.queue.qsize(),
+            "max_size": self.maxsize,
+            "workers": len(self.worker_tasks),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_wait_ms": round(self.total_wait / dequeued * 1000, 2) if dequeued else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2)
+        }
+
+# Global instance
+update_queue = UpdateQueue()
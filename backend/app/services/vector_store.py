@@ -1,78 +1,648 @@
 import chromadb
 from chromadb.config import Settings
+import asyncio
+import bisect
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
+from app.services.embedding_service import embedding_service
+from app.services.lexical_index import BM25Index, tokenize
+from app.services.retrieval_cache import retrieval_cache
+
 load_dotenv()
 
+# Documents are split into overlapping character windows before embedding
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Each community has its own collection, so a search only walks that community's index
+COLLECTION_PREFIX = "community_"
+# Earlier questions and their answers, for the opt-in semantic answer cache
+ANSWER_COLLECTION_PREFIX = "answers_"
+# Collection shared by all communities before they were split up
+LEGACY_COLLECTION = "community_memory"
+MIGRATION_BATCH_SIZE = 500
+
+# Keyword (BM25) indexes are built per community from its collection and kept in an LRU
+LEXICAL_INDEX_COMMUNITIES = int(os.getenv("LEXICAL_INDEX_COMMUNITIES", "200"))
+# Rebuild age (seconds) so writes made by other backend workers are picked up; 0 never rebuilds
+LEXICAL_INDEX_TTL = float(os.getenv("LEXICAL_INDEX_TTL", "600"))
+# Short queries fully matched by keywords skip the embedding query, but only when the top hit is
+# strong (normalized BM25 score) and clearly ahead of the second hit
+LEXICAL_FAST_PATH_MAX_TERMS = int(os.getenv("LEXICAL_FAST_PATH_MAX_TERMS", "4"))
+LEXICAL_FAST_PATH_MIN_SCORE = float(os.getenv("LEXICAL_FAST_PATH_MIN_SCORE", "1.0"))
+LEXICAL_FAST_PATH_MARGIN = float(os.getenv("LEXICAL_FAST_PATH_MARGIN", "1.5"))
+RRF_K = 60
+SEARCH_MODES = ("hybrid", "lexical", "vector")
+
+# Chroma calls (including the local embedding model) block, so they run on their own thread pool.
+# Callers waiting longer than VECTOR_STORE_QUEUE_TIMEOUT for a slot get VectorStoreBusyError.
+VECTOR_STORE_WORKERS = int(os.getenv("VECTOR_STORE_WORKERS", "4"))
+VECTOR_STORE_QUEUE_TIMEOUT = float(os.getenv("VECTOR_STORE_QUEUE_TIMEOUT", "10"))
+VECTOR_STORE_OP_TIMEOUT = float(os.getenv("VECTOR_STORE_OP_TIMEOUT", "60"))
+
+# Upper bounds (ms) of the per-operation latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
 chroma_client = None
-collection = None
+_collections: Dict[str, Any] = {}
+_lexical_indexes: "OrderedDict[str, Tuple[BM25Index, float]]" = OrderedDict()
+# Bumped by every write mirrored into the keyword index, so a build that raced a write is not kept
+_lexical_versions: Dict[str, int] = {}
+_lexical_lock = threading.Lock()
+LEXICAL_INDEX_BUILD_ATTEMPTS = 3
+
+ingest_stats = {"documents": 0, "chunks": 0, "characters": 0, "seconds": 0.0}
+search_stats = {"index_builds": 0, "index_build_races": 0}
+search_latencies: Dict[str, deque] = {mode: deque(maxlen=1000) for mode in SEARCH_MODES}
+
+executor = ThreadPoolExecutor(max_workers=VECTOR_STORE_WORKERS, thread_name_prefix="chroma")
+_semaphore = None
+_pool_stats = {"in_flight": 0, "waiting": 0, "queue_timeouts": 0, "op_timeouts": 0, "failed": 0}
+_op_latencies: Dict[str, Dict[str, Any]] = {}
+
+class VectorStoreBusyError(Exception):
+    """Raised when no vector store slot frees up within VECTOR_STORE_QUEUE_TIMEOUT"""
+    pass
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(VECTOR_STORE_WORKERS)
+    return _semaphore
+
+def _record_latency(op: str, seconds: float):
+    histogram = _op_latencies.get(op)
+    if histogram is None:
+        histogram = _op_latencies[op] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+    ms = seconds * 1000
+    histogram["count"] += 1
+    histogram["total_ms"] += ms
+    histogram["max_ms"] = max(histogram["max_ms"], ms)
+    histogram["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+def _release_slot(semaphore: asyncio.Semaphore):
+    _pool_stats["in_flight"] -= 1
+    semaphore.release()
+
+def _call_in_loop(loop: asyncio.AbstractEventLoop, callback: Callable, *args):
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        # The loop closed during shutdown; there is nothing left to release
+        pass
+
+async def _run(op: str, func: Callable, *args, **kwargs):
+    """Run a blocking vector store call on the Chroma thread pool, bounded by VECTOR_STORE_WORKERS"""
+    semaphore = _get_semaphore()
+    _pool_stats["waiting"] += 1
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=VECTOR_STORE_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _pool_stats["queue_timeouts"] += 1
+        raise VectorStoreBusyError(f"No vector store slot available within {VECTOR_STORE_QUEUE_TIMEOUT}s")
+    finally:
+        _pool_stats["waiting"] -= 1
+    
+    _pool_stats["in_flight"] += 1
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    future = executor.submit(func, *args, **kwargs)
+    # A timed-out call keeps its thread busy, so the slot is freed when the thread finishes
+    # rather than when the caller stops waiting
+    future.add_done_callback(lambda _: _call_in_loop(loop, _release_slot, semaphore))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=VECTOR_STORE_OP_TIMEOUT)
+    except asyncio.TimeoutError:
+        _pool_stats["op_timeouts"] += 1
+        _pool_stats["failed"] += 1
+        raise
+    except Exception:
+        _pool_stats["failed"] += 1
+        raise
+    finally:
+        _record_latency(op, time.perf_counter() - started)
+
+async def _write(op: str, community_id: str, func: Callable, *args, invalidate: bool = True):
+    """Run a write on the pool and (unless ``invalidate`` is False) start a new retrieval cache generation for the community"""
+    try:
+        return await _run(op, func, *args)
+    finally:
+        # Also on failure or timeout: the write may have been applied anyway
+        if invalidate:
+            retrieval_cache.invalidate(community_id)
 
 async def init_vector_store():
-    global chroma_client, collection
+    global chroma_client
     try:
         chroma_client = chromadb.PersistentClient(
             path="./chroma_db",
             settings=Settings(anonymized_telemetry=False)
         )
-        collection = chroma_client.get_or_create_collection(
-            name="community_memory",
-            metadata={"hnsw:space": "cosine"}
-        )
+        _collections.clear()
+        _lexical_indexes.clear()
         print("✅ Chroma vector store initialized")
     except Exception as e:
         print(f"❌ Failed to initialize Chroma: {e}")
         raise
+    
+    try:
+        await asyncio.get_running_loop().run_in_executor(executor, migrate_shared_collection)
+    except Exception as e:
+        print(f"⚠️  Shared collection migration failed (will retry on next start): {e}")
 
-def get_collection():
+def _open_collection(name: str):
+    if not chroma_client:
+        raise Exception("Vector store not initialized")
+    
+    collection = _collections.get(name)
+    if collection is None:
+        collection = chroma_client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+        _collections[name] = collection
     return collection
 
-async def add_document(community_id: str, document_id: str, text: str, metadata: dict = None):
-    """Add document to vector store"""
-    if not collection:
+def get_collection(community_id: str):
+    """Return a community's collection, creating it on first use"""
+    return _open_collection(f"{COLLECTION_PREFIX}{community_id}")
+
+async def has_collection(community_id: str) -> bool:
+    """Whether a community's collection exists, without creating it"""
+    name = f"{COLLECTION_PREFIX}{community_id}"
+    if name in _collections:
+        return True
+    if not chroma_client:
         raise Exception("Vector store not initialized")
     
-    if not text or len(text.strip()) == 0:
+    def exists() -> bool:
+        try:
+            chroma_client.get_collection(name)
+            return True
+        except Exception:
+            return False
+    
+    return await _run("collection_exists", exists)
+
+def get_answer_collection(community_id: str):
+    return _open_collection(f"{ANSWER_COLLECTION_PREFIX}{community_id}")
+
+async def get_lexical_index(community_id: str) -> BM25Index:
+    """Return a community's keyword index, building it from the collection when missing or stale"""
+    cached = _lexical_indexes.get(community_id)
+    if cached and (LEXICAL_INDEX_TTL <= 0 or time.monotonic() - cached[1] < LEXICAL_INDEX_TTL):
+        _lexical_indexes.move_to_end(community_id)
+        return cached[0]
+    
+    for _ in range(LEXICAL_INDEX_BUILD_ATTEMPTS):
+        version = _lexical_versions.get(community_id, 0)
+        index = await _run("index_build", _build_lexical_index, community_id)
+        search_stats["index_builds"] += 1
+        with _lexical_lock:
+            # Only keep the index if no write was mirrored while the snapshot was taken; such a
+            # write skipped the unregistered index and may be missing from the snapshot
+            if _lexical_versions.get(community_id, 0) == version:
+                _lexical_indexes[community_id] = (index, time.monotonic())
+                _lexical_indexes.move_to_end(community_id)
+                while len(_lexical_indexes) > LEXICAL_INDEX_COMMUNITIES:
+                    _lexical_indexes.popitem(last=False)
+                return index
+        search_stats["index_build_races"] += 1
+    # Still being written to: serve this build once and try again on the next search
+    return index
+
+def _build_lexical_index(community_id: str) -> BM25Index:
+    index = BM25Index()
+    stored = get_collection(community_id).get(include=["documents", "metadatas"])
+    for entry_id, text, meta in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+        index.add(entry_id, text or "", meta)
+    return index
+
+def _add_entries(
+    community_id: str,
+    ids: List[str],
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    embeddings: List[List[float]]
+):
+    """Write entries to a community's collection and its loaded keyword index (runs on the pool)"""
+    get_collection(community_id).add(documents=documents, embeddings=embeddings, ids=ids, metadatas=metadatas)
+    
+    def update(index: BM25Index):
+        for entry_id, text, meta in zip(ids, documents, metadatas):
+            index.add(entry_id, text, meta)
+    
+    _update_lexical_index(community_id, update)
+
+def _update_lexical_index(community_id: str, update: Callable[[BM25Index], Any]):
+    """Mirror a collection write into the community's keyword index (runs on the pool, after the write).
+
+    Unloaded indexes are built on next use; a build in progress is discarded (see get_lexical_index).
+    """
+    with _lexical_lock:
+        _lexical_versions[community_id] = _lexical_versions.get(community_id, 0) + 1
+        cached = _lexical_indexes.get(community_id)
+    if cached:
+        update(cached[0])
+
+def migrate_shared_collection():
+    """Move entries from the old shared collection into per-community collections.
+
+    Stored embeddings are copied as-is, so nothing is re-embedded. Entries are removed from the
+    shared collection once copied and the collection is dropped when empty, so an interrupted
+    migration simply continues on the next start.
+    """
+    try:
+        legacy = chroma_client.get_collection(LEGACY_COLLECTION)
+    except Exception:
         return
     
-    collection.add(
-        documents=[text],
-        ids=[f"{community_id}_{document_id}"],
-        metadatas=[{
+    ids = legacy.get(include=[])["ids"]
+    migrated = 0
+    for batch_start in range(0, len(ids), MIGRATION_BATCH_SIZE):
+        batch = legacy.get(
+            ids=ids[batch_start:batch_start + MIGRATION_BATCH_SIZE],
+            include=["documents", "embeddings", "metadatas"]
+        )
+        by_community: Dict[str, List[int]] = {}
+        for index, meta in enumerate(batch["metadatas"]):
+            if meta and meta.get("community_id"):
+                by_community.setdefault(meta["community_id"], []).append(index)
+        
+        for community_id, rows in by_community.items():
+            get_collection(community_id).upsert(
+                ids=[batch["ids"][i] for i in rows],
+                documents=[batch["documents"][i] for i in rows],
+                embeddings=[list(batch["embeddings"][i]) for i in rows],
+                metadatas=[batch["metadatas"][i] for i in rows]
+            )
+            legacy.delete(ids=[batch["ids"][i] for i in rows])
+            migrated += len(rows)
+    
+    if legacy.count() == 0:
+        chroma_client.delete_collection(LEGACY_COLLECTION)
+    else:
+        print(f"⚠️  {legacy.count()} entries without a community left in {LEGACY_COLLECTION}")
+    if migrated:
+        print(f"Migrated {migrated} vector store entries into {len(_collections)} community collections")
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[Dict[str, Any]]:
+    """Split text into overlapping chunks, preferring to break on whitespace.
+
+    Each chunk carries its start/end character offsets within ``text``.
+    """
+    overlap = min(overlap, chunk_size // 2)
+    chunks = []
+    start = 0
+    length = len(text)
+    
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length:
+            # Back up to the last whitespace so words are not cut in half
+            split = text.rfind(" ", start + chunk_size // 2, end)
+            newline = text.rfind("\n", start + chunk_size // 2, end)
+            split = max(split, newline)
+            if split > start:
+                end = split
+        
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append({"text": chunk, "start": start, "end": end})
+        
+        if end >= length:
+            break
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    
+    return chunks
+
+def chunk_pages(pages: List[str], chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[Dict[str, Any]]:
+    """Chunk each page separately, keeping the page number and document-wide offsets"""
+    chunks = []
+    offset = 0
+    for page_number, page_text in enumerate(pages, start=1):
+        for chunk in chunk_text(page_text, chunk_size, overlap):
+            chunks.append({
+                "text": chunk["text"],
+                "page": page_number,
+                "start": offset + chunk["start"],
+                "end": offset + chunk["end"]
+            })
+        offset += len(page_text) + 1  # pages are joined with a newline
+    return chunks
+
+async def add_document(
+    community_id: str,
+    document_id: str,
+    text: str = "",
+    metadata: dict = None,
+    pages: List[str] = None,
+    on_progress: Callable[[int, int], Awaitable[None]] = None
+) -> Dict[str, Any]:
+    """Chunk a document and add the chunks to the vector store in batches.
+
+    Pass ``pages`` to keep page numbers in the chunk metadata; otherwise ``text`` is treated as one page.
+    ``on_progress(done, total)`` is awaited after each batch. Returns ingest statistics for the document.
+    """
+    if pages is None:
+        pages = [text or ""]
+    
+    started = time.perf_counter()
+    chunks = chunk_pages(pages)
+    if not chunks:
+        return {"chunks": 0, "seconds": 0.0, "chunks_per_second": 0.0}
+    
+    for batch_start in range(0, len(chunks), EMBED_BATCH_SIZE):
+        batch = chunks[batch_start:batch_start + EMBED_BATCH_SIZE]
+        ids = [f"{community_id}_{document_id}_{batch_start + i}" for i in range(len(batch))]
+        documents = [chunk["text"] for chunk in batch]
+        metadatas = [{
             "community_id": community_id,
             "document_id": document_id,
-            **(metadata or {})
-        }]
-    )
+            **(metadata or {}),
+            "chunk_index": batch_start + i,
+            "page": chunk["page"],
+            "start_offset": chunk["start"],
+            "end_offset": chunk["end"]
+        } for i, chunk in enumerate(batch)]
+        embeddings = await embedding_service.embed(documents)
+        await _write("add", community_id, _add_entries, community_id, ids, documents, metadatas, embeddings)
+        if on_progress:
+            await on_progress(batch_start + len(batch), len(chunks))
+    
+    elapsed = time.perf_counter() - started
+    characters = sum(len(chunk["text"]) for chunk in chunks)
+    ingest_stats["documents"] += 1
+    ingest_stats["chunks"] += len(chunks)
+    ingest_stats["characters"] += characters
+    ingest_stats["seconds"] += elapsed
+    
+    rate = len(chunks) / elapsed if elapsed > 0 else 0.0
+    print(f"Indexed document {document_id}: {len(chunks)} chunks in {elapsed:.2f}s ({rate:.1f} chunks/s)")
+    return {"chunks": len(chunks), "seconds": round(elapsed, 3), "chunks_per_second": round(rate, 1)}
+
+async def find_document_chunks(content_hash: str, community_id: str, include_embeddings: bool = False) -> Dict[str, Any]:
+    """Look up a community's stored chunks of a document by its content hash"""
+    include = ["documents", "metadatas"]
+    if include_embeddings:
+        include.append("embeddings")
+    return await _run("get", lambda: get_collection(community_id).get(where={"content_hash": content_hash}, include=include))
+
+async def copy_document(
+    community_id: str,
+    document_id: str,
+    content_hash: str,
+    source_community_id: str,
+    metadata: dict = None
+) -> Optional[Dict[str, Any]]:
+    """Attach a document already embedded for ``source_community_id`` to another community
+    by reusing its stored embeddings.
+
+    Returns None when the source community does not have that content (any more).
+    """
+    existing = await find_document_chunks(content_hash, source_community_id, include_embeddings=True)
+    if not existing["ids"]:
+        return None
+    
+    # Keep one copy of each chunk (the content may have been uploaded to the source more than once)
+    source_document = existing["metadatas"][0]["document_id"]
+    rows = [
+        (text, embedding, meta)
+        for text, embedding, meta in zip(existing["documents"], existing["embeddings"], existing["metadatas"])
+        if meta["document_id"] == source_document
+    ]
+    rows.sort(key=lambda row: row[2].get("chunk_index", 0))
+    
+    started = time.perf_counter()
+    for batch_start in range(0, len(rows), EMBED_BATCH_SIZE):
+        batch = rows[batch_start:batch_start + EMBED_BATCH_SIZE]
+        ids = [f"{community_id}_{document_id}_{row[2].get('chunk_index', batch_start + i)}" for i, row in enumerate(batch)]
+        documents = [row[0] for row in batch]
+        metadatas = [{
+            **row[2],
+            **(metadata or {}),
+            "community_id": community_id,
+            "document_id": document_id
+        } for row in batch]
+        await _write("add", community_id, _add_entries, community_id, ids, documents, metadatas, [list(row[1]) for row in batch])
+    
+    elapsed = time.perf_counter() - started
+    print(f"Reused embeddings for document {document_id}: {len(rows)} chunks in {elapsed:.3f}s")
+    return {"chunks": len(rows), "seconds": round(elapsed, 3), "reused": True}
+
+async def delete_document(community_id: str, document_id: str):
+    """Remove all chunks of one document from a community"""
+    def delete():
+        get_collection(community_id).delete(where={"document_id": document_id})
+        _update_lexical_index(community_id, lambda index: index.remove_where("document_id", document_id))
+    
+    await _write("delete", community_id, delete)
 
 async def add_memory(community_id: str, memory_id: str, text: str, metadata: dict = None):
     """Add community memory to vector store"""
-    if not collection:
-        raise Exception("Vector store not initialized")
-    
     if not text or len(text.strip()) == 0:
         return
     
-    collection.add(
-        documents=[text],
-        ids=[f"memory_{community_id}_{memory_id}"],
-        metadatas=[{
+    ids = [f"memory_{community_id}_{memory_id}"]
+    metadatas = [{
+        "community_id": community_id,
+        "type": "memory",
+        **(metadata or {})
+    }]
+    embeddings = await embedding_service.embed([text])
+    await _write("add", community_id, _add_entries, community_id, ids, [text], metadatas, embeddings)
+
+async def add_memories(memories: List[Dict[str, Any]]):
+    """Add several memories with one write per community.
+
+    Each item has ``community_id``, ``memory_id``, ``text`` and optional ``metadata`` (as for add_memory).
+    """
+    memories = [memory for memory in memories if memory["text"] and memory["text"].strip()]
+    by_community: Dict[str, List[Dict[str, Any]]] = {}
+    for memory in memories:
+        by_community.setdefault(memory["community_id"], []).append(memory)
+    
+    for community_id, batch in by_community.items():
+        ids = [f"memory_{community_id}_{memory['memory_id']}" for memory in batch]
+        documents = [memory["text"] for memory in batch]
+        metadatas = [{
             "community_id": community_id,
             "type": "memory",
-            **(metadata or {})
-        }]
-    )
+            **(memory.get("metadata") or {})
+        } for memory in batch]
+        embeddings = await embedding_service.embed(documents)
+        # Interaction memories are flushed every few hundred milliseconds on an active community;
+        # starting a new generation for each flush would leave the retrieval cache almost always
+        # empty, so cached results may miss the latest interactions until RETRIEVAL_CACHE_TTL
+        invalidate = any(metadata["type"] != "interaction" for metadata in metadatas)
+        await _write("add", community_id, _add_entries, community_id, ids, documents, metadatas, embeddings, invalidate=invalidate)
 
-async def search(community_id: str, query: str, n_results: int = 5):
-    """Search in vector store for a specific community"""
-    if not collection:
-        raise Exception("Vector store not initialized")
+async def get_memories(community_id: str, memory_type: str) -> Dict[str, Any]:
+    """All of a community's memories of one type (e.g. ``interaction`` or ``summary``)"""
+    return await _run("get", lambda: get_collection(community_id).get(where={"type": memory_type}, include=["documents", "metadatas"]))
+
+async def delete_memories(community_id: str, ids: List[str]):
+    if not ids:
+        return
+    
+    def delete():
+        get_collection(community_id).delete(ids=ids)
+        _update_lexical_index(community_id, lambda index: index.remove(ids))
+    
+    await _write("delete", community_id, delete)
+
+async def find_similar_answer(community_id: str, question: str, where: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Closest earlier question in the community's answer cache matching ``where``, with its similarity"""
+    embedding = (await embedding_service.embed([question]))[0]
+    results = await _run("answer_query", lambda: get_answer_collection(community_id).query(
+        query_embeddings=[embedding],
+        n_results=1,
+        where=where,
+        include=["metadatas", "distances"]
+    ))
+    if not results["ids"] or not results["ids"][0]:
+        return None
+    # Cosine distance
+    return {"similarity": 1 - results["distances"][0][0], "metadata": results["metadatas"][0][0]}
+
+async def add_answer(community_id: str, question: str, answer: str, metadata: Dict[str, Any]):
+    """Remember a generated answer, keyed by the embedding of its question"""
+    embeddings = await embedding_service.embed([question])
+    await _run("answer_add", lambda: get_answer_collection(community_id).add(
+        ids=[str(uuid.uuid4())],
+        documents=[question],
+        embeddings=embeddings,
+        metadatas=[{**metadata, "answer": answer}]
+    ))
+
+async def delete_answers_before(community_id: str, created_before: float):
+    await _run("answer_delete", lambda: get_answer_collection(community_id).delete(where={"created_at": {"$lt": created_before}}))
+
+async def search(community_id: str, query: str, n_results: int = 5, mode: str = "hybrid", use_cache: bool = True):
+    """Search in vector store for a specific community.
+
+    ``hybrid`` fuses BM25 keyword hits and vector hits with reciprocal rank fusion, answering from
+    keywords alone when a short query is fully matched; ``lexical`` and ``vector`` use one side only.
+    Results have Chroma's query shape plus the ``mode`` that produced them, and are served from
+    the retrieval cache until the community is written to or the entry expires.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+    
+    if use_cache:
+        cached = retrieval_cache.get(community_id, query, n_results, mode)
+        if cached is not None:
+            return cached
+    generation = retrieval_cache.generation(community_id)
+    
+    started = time.perf_counter()
+    lexical = []
+    if mode != "vector":
+        index = await get_lexical_index(community_id)
+        lexical = await _run("lexical_search", index.search, query, n_results * 2 if mode == "hybrid" else n_results)
     
-    results = collection.query(
-        query_texts=[query],
-        n_results=n_results,
-        where={"community_id": community_id}
-    )
+    fast_path = mode == "hybrid" and _strong_keyword_match(lexical, query)
     
+    if mode == "lexical" or fast_path:
+        used = "lexical"
+        hits = lexical[:n_results]
+        results = {
+            "ids": [[hit["id"] for hit in hits]],
+            "documents": [[hit["document"] for hit in hits]],
+            "metadatas": [[hit["metadata"] for hit in hits]]
+        }
+    else:
+        used = mode
+        embedding = (await embedding_service.embed([query]))[0]
+        vector = await _run("query", lambda: get_collection(community_id).query(
+            query_embeddings=[embedding],
+            n_results=n_results * 2 if mode == "hybrid" else n_results
+        ))
+        results = _fuse(lexical, vector, n_results) if mode == "hybrid" else dict(vector)
+    
+    results["mode"] = used
+    search_latencies[used].append(time.perf_counter() - started)
+    retrieval_cache.put(community_id, generation, query, n_results, mode, results)
     return results
 
+def _strong_keyword_match(hits: List[Dict[str, Any]], query: str) -> bool:
+    """Whether keyword hits alone can answer a hybrid query, skipping the embedding query"""
+    if not hits or len(set(tokenize(query))) > LEXICAL_FAST_PATH_MAX_TERMS:
+        return False
+    top = hits[0]
+    # Interactions store the user's message verbatim, so a repeated question would always match
+    # earlier chat in full; those hits never qualify on their own
+    if top["metadata"].get("type") == "interaction" or top["coverage"] < 1:
+        return False
+    if top["normalized_score"] < LEXICAL_FAST_PATH_MIN_SCORE:
+        return False
+    return len(hits) < 2 or top["score"] >= LEXICAL_FAST_PATH_MARGIN * hits[1]["score"]
+
+def _fuse(lexical: List[Dict[str, Any]], vector: Dict[str, Any], n_results: int) -> Dict[str, Any]:
+    """Reciprocal rank fusion of keyword and vector hits"""
+    scores: Dict[str, float] = {}
+    entries: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    for rank, hit in enumerate(lexical):
+        scores[hit["id"]] = scores.get(hit["id"], 0.0) + 1 / (RRF_K + rank + 1)
+        entries[hit["id"]] = (hit["document"], hit["metadata"])
+    
+    vector_hits = zip(vector["ids"][0], vector["documents"][0], vector["metadatas"][0]) if vector["ids"] else []
+    for rank, (entry_id, text, meta) in enumerate(vector_hits):
+        scores[entry_id] = scores.get(entry_id, 0.0) + 1 / (RRF_K + rank + 1)
+        entries.setdefault(entry_id, (text, meta))
+    
+    ranked = sorted(scores, key=scores.get, reverse=True)[:n_results]
+    return {
+        "ids": [ranked],
+        "documents": [[entries[entry_id][0] for entry_id in ranked]],
+        "metadatas": [[entries[entry_id][1] for entry_id in ranked]]
+    }
+
+def get_search_stats() -> Dict[str, Any]:
+    """Search latency per mode over the most recent queries"""
+    modes = {}
+    for mode, latencies in search_latencies.items():
+        ordered = sorted(latencies)
+        modes[mode] = {
+            "samples": len(ordered),
+            "avg_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2) if ordered else 0.0,
+            "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 2) if ordered else 0.0
+        }
+    return {**search_stats, "loaded_indexes": len(_lexical_indexes), "modes": modes}
+
+def get_vector_store_stats() -> Dict[str, Any]:
+    """Thread pool usage and a latency histogram per vector store operation"""
+    operations = {}
+    for op, histogram in _op_latencies.items():
+        buckets = {f"le_{bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, histogram["buckets"])}
+        buckets["inf"] = histogram["buckets"][-1]
+        operations[op] = {
+            "count": histogram["count"],
+            "avg_ms": round(histogram["total_ms"] / histogram["count"], 2),
+            "max_ms": round(histogram["max_ms"], 2),
+            "buckets": buckets
+        }
+    return {"workers": VECTOR_STORE_WORKERS, **_pool_stats, "operations": operations}
+
+def shutdown_executor():
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def get_ingest_stats() -> Dict[str, Any]:
+    seconds = ingest_stats["seconds"]
+    return {
+        **ingest_stats,
+        "seconds": round(seconds, 3),
+        "chunks_per_second": round(ingest_stats["chunks"] / seconds, 1) if seconds else 0.0,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "batch_size": EMBED_BATCH_SIZE,
+        "open_collections": len(_collections)
+    }
@@ -5,7 +5,30 @@ from dotenv import load_dotenv
 
 from app.database import init_db
 from app.routers import auth, communities, webhooks
-from app.services.vector_store import init_vector_store
+from app.services.vector_store import (
+    init_vector_store,
+    get_ingest_stats,
+    get_search_stats,
+    get_vector_store_stats,
+    shutdown_executor as shutdown_vector_store_executor
+)
+from app.services.update_queue import update_queue
+from app.services.http_client import init_http_client, close_http_client
+from app.services.community_cache import community_cache
+from app.services.gemini_service import get_gemini_stats
+from app.services.document_processor import shutdown_executor as shutdown_document_executor
+from app.services.ingest_jobs import ingest_jobs
+from app.services.post_scheduler import post_scheduler
+from app.services.leases import lease_manager
+from app.services.outbound_queue import outbound_queue
+from app.services.telegram_service import telegram_service
+from app.services.post_drafts import post_drafts
+from app.services.memory_buffer import memory_buffer
+from app.services.memory_compaction import memory_compactor
+from app.services.embedding_service import embedding_service, shutdown_executor as shutdown_embedding_executor
+from app.services.embedding_cache import embedding_cache
+from app.services.retrieval_cache import retrieval_cache
+from app.services.answer_cache import answer_cache
 
 load_dotenv()
 
@@ -22,9 +45,33 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️  Vector store initialization warning: {e}")
     
+    await init_http_client()
+    await embedding_service.start()
+    await memory_buffer.start()
+    await outbound_queue.start()
+    await update_queue.start(webhooks.handle_telegram_update)
+    await lease_manager.start()
+    await ingest_jobs.start()
+    await post_scheduler.start(telegram_service.post_immediately)
+    await post_drafts.start(telegram_service.generate_draft, lambda: post_scheduler.schedules.values())
+    await memory_compactor.start()
+    
     yield
     # Shutdown
-    pass
+    await update_queue.stop()
+    await memory_buffer.stop()
+    await ingest_jobs.stop()
+    await post_scheduler.stop()
+    await post_drafts.stop()
+    await memory_compactor.stop()
+    await lease_manager.stop()
+    await outbound_queue.stop()
+    await embedding_service.stop()
+    await close_http_client()
+    shutdown_document_executor()
+    shutdown_vector_store_executor()
+    shutdown_embedding_executor()
+    embedding_cache.close()
 
 app = FastAPI(
     title="PowerHause API",
@@ -55,6 +102,29 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/api/metrics")
+async def metrics():
+    """In-process queue and cache statistics"""
+    return {
+        "webhook_queue": update_queue.get_stats(),
+        "community_cache": community_cache.get_stats(),
+        "gemini": get_gemini_stats(),
+        "document_ingest": get_ingest_stats(),
+        "retrieval": get_search_stats(),
+        "vector_store": get_vector_store_stats(),
+        "embeddings": embedding_service.get_stats(),
+        "embedding_cache": embedding_cache.get_stats(),
+        "retrieval_cache": retrieval_cache.get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "ingest_jobs": ingest_jobs.get_stats(),
+        "post_scheduler": post_scheduler.get_stats(),
+        "leases": lease_manager.get_stats(),
+        "outbound_queue": outbound_queue.get_stats(),
+        "post_drafts": post_drafts.get_stats(),
+        "memory_buffer": memory_buffer.get_stats(),
+        "memory_compaction": memory_compactor.get_stats()
+    }
+
 @app.get("/api/gemini/status")
 async def gemini_status():
     """Check Gemini API configuration and status"""
@@ -63,7 +133,7 @@ async def gemini_status():
     
     # Import the gemini_service module to access its model
     sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-    from app.services.gemini_service import model
+    from app.services.gemini_service import model, generate_text
     
     api_key = os.getenv("GEMINI_API_KEY", "KEY HERE")
     
@@ -77,9 +147,9 @@ async def gemini_status():
     if model is not None:
         try:
             # Test the API with a simple request
-            test_response = model.generate_content("Say 'API is working' if you can read this.")
+            test_text = await generate_text("Say 'API is working' if you can read this.")
             status["api_working"] = True
-            status["test_response"] = test_response.text[:50] + "..." if len(test_response.text) > 50 else test_response.text
+            status["test_response"] = test_text[:50] + "..." if len(test_text) > 50 else test_text
         except Exception as e:
             status["api_working"] = False
             status["error"] = str(e)
@@ -91,6 +161,7 @@ async def gemini_status():
         else:
             status["error"] = "Model not initialized - check API key validity"
     
+    status["concurrency"] = get_gemini_stats()
     return status
 
 if __name__ == "__main__":
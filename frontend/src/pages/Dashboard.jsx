@@ -13,20 +13,27 @@ function Dashboard() {
   }
   const [communities, setCommunities] = useState([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState(null)
 
   useEffect(() => {
     fetchCommunities()
   }, [])
 
-  const fetchCommunities = async () => {
+  const fetchCommunities = async (cursor = null) => {
     try {
       // Skip auth token for now
-      const response = await axios.get('/api/communities')
-      setCommunities(response.data)
+      const response = await axios.get('/api/communities', {
+        params: cursor ? { cursor } : {}
+      })
+      const { items, next_cursor } = response.data
+      setCommunities((previous) => (cursor ? [...previous, ...items] : items))
+      setNextCursor(next_cursor)
     } catch (error) {
       console.error('Failed to fetch communities:', error)
       // Set empty array on error for testing
-      setCommunities([])
+      if (!cursor) {
+        setCommunities([])
+      }
     } finally {
       setLoading(false)
     }
@@ -137,7 +144,7 @@ function Dashboard() {
                     </div>
                     <div className="stat">
                       <span className="stat-label">Documents</span>
-                      <span className="stat-value">{community.documents?.length || 0}</span>
+                      <span className="stat-value">{community.documentCount || 0}</span>
                     </div>
                   </div>
                   <div className="community-actions">
@@ -160,6 +167,14 @@ function Dashboard() {
               ))}
             </div>
           )}
+
+          {nextCursor && (
+            <div className="load-more">
+              <button className="btn-secondary" onClick={() => fetchCommunities(nextCursor)}>
+                Load more
+              </button>
+            </div>
+          )}
         </div>
       </main>
 